@@ -0,0 +1,362 @@
+"""
+Load test for every HTTP endpoint of main.py, fully offline.
+
+The FastAPI app is imported in-process with its module-level `model` and `supabase` clients replaced by
+the fakes in benchmarks/fakes.py, then each endpoint is driven through the ASGI interface at every
+requested concurrency level. Throughput and p50/p95/p99 latency are printed, written as JSON to
+--output, and compared against --baseline: if any endpoint's throughput drops or its p95 latency grows
+by more than --max-regression, the run exits with status 1.
+
+Absolute numbers only compare on the machine that recorded them. Every run also times a fixed CPU
+workload (calibration_ms) and records the host. Against a baseline from another host, the baseline's
+times are scaled by how much slower this machine is (never scaled down, since the fake LLM and Supabase
+latencies do not get faster). Re-record the baseline on the machine that runs the comparison
+(--save-baseline) for a strict check.
+
+Usage (from the backend/ directory):
+    python benchmarks/api_bench.py                                  # compare against the stored baseline
+    python benchmarks/api_bench.py --save-baseline                  # re-record the baseline
+    python benchmarks/api_bench.py --endpoints news_feed discover --concurrency 1 64 \\
+        --llm-latency 0.2 --quota-error-rate 0.05 --malformed-json-rate 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+from fakes import FakeGeminiModel, FakeSupabaseClient, fake_profiles  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "api_bench.json")
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "benchmarks", "results", "api_bench.json")
+
+# Fake-service settings recorded with the results; a baseline is only comparable under the same settings.
+FAKE_SETTINGS = ("llm_latency", "llm_jitter", "error_rate", "quota_error_rate", "malformed_json_rate",
+                 "supabase_latency", "supabase_error_rate", "profiles", "distinct_prompts", "dummy_count")
+
+
+class Scenario:
+    """
+    One endpoint under load: request i is built by make_request(i) -> (method, path, json body or None).
+    setup(requests) may be a coroutine function; settle() runs after the measured requests.
+    """
+
+    def __init__(self, name: str, make_request: Callable[[int], tuple],
+                 setup: Optional[Callable[[int], None]] = None, settle: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.make_request = make_request
+        self.setup = setup
+        self.settle = settle
+
+
+def import_app(args: argparse.Namespace, workdir: str):
+    """Imports main with offline settings and swaps in the fake Gemini model and Supabase client."""
+    os.environ.update({
+        # Empty credentials keep main from configuring the real clients; load_dotenv does not override them.
+        "GOOGLE_API_KEY": "",
+        "SUPABASE_URL": "",
+        "SUPABASE_SERVICE_ROLE_KEY": "",
+        "DISCOVERY_PRELOAD": "false",
+        "EMBEDDING_PROVIDER": "hashing",
+        "EMBEDDING_STORE_PATH": os.path.join(workdir, "profile_embeddings"),
+        "GEMINI_RPM_LIMIT": str(args.rpm),
+        "GEMINI_TPM_LIMIT": str(args.tpm),
+        "LOG_LEVEL": args.log_level,
+    })
+    import main
+
+    main.model = FakeGeminiModel(latency=args.llm_latency, jitter=args.llm_jitter, error_rate=args.error_rate,
+                                 quota_error_rate=args.quota_error_rate,
+                                 malformed_json_rate=args.malformed_json_rate, seed=args.seed)
+    main.supabase = FakeSupabaseClient(latency=args.supabase_latency, error_rate=args.supabase_error_rate,
+                                       seed=args.seed)
+    return main
+
+
+def build_scenarios(main, args: argparse.Namespace) -> List[Scenario]:
+    distinct = args.distinct_prompts
+    profile_ids = [f"bench-{i}" for i in range(args.profiles)]
+    seeded = []
+    for profile_id, profile in zip(profile_ids, fake_profiles(args.profiles)):
+        profile["id"] = profile_id
+        seeded.append(profile)
+    main.profile_matrix.upsert_many(seeded)
+    store = asyncio.run(main.get_embedding_store())
+    store.upsert_texts({p["id"]: main.profile_embedding_text(p) for p in seeded})
+    job_ids: List[str] = []
+    retry_job_ids: List[str] = []
+    installed_precomputer: List[Any] = []
+
+    def profile_body(i):
+        return {"user_data": {"name": f"user {i % distinct}", "hobby": "climbing"}}
+
+    def news_feed_body(i):
+        return {"user_profile_summary": f"Profile {i % distinct}: loves hiking and jazz.",
+                "recent_activity": [{"type": "like", "from": f"user {i % 7}"}, {"type": "match", "with": "user 3"}],
+                "num_items": 3}
+
+    def seed_deletions(requests):
+        main.profile_matrix.upsert_many({"id": f"delete-{i}", "height_cm": 170} for i in range(requests))
+
+    def start_job_for_status(_):
+        # A fresh job per level: older ones may have been evicted by the dummy_users_job scenario.
+        job_ids[:] = [main.dummy_user_jobs.start(1).id]
+
+    async def wait_for_jobs():
+        while any(job.status in ("queued", "running") for job in main.dummy_user_jobs._jobs.values()):
+            await asyncio.sleep(0.05)
+
+    async def start_finished_jobs(requests):
+        # One finished job per request, since a job that is being retried answers 409 until it is done.
+        main.dummy_user_jobs.max_jobs_retained = max(main.dummy_user_jobs.max_jobs_retained, 2 * requests)
+        retry_job_ids[:] = [main.dummy_user_jobs.start(1).id for _ in range(requests)]
+        await wait_for_jobs()
+
+    def install_precomputer(_):
+        # Not started: measures recording activity, not the background refreshes it would trigger.
+        installed_precomputer[:] = [main.feed_precomputer]
+        main.feed_precomputer = main.FeedPrecomputer(main.precompute_daily_prompt, main.precompute_news_feed)
+
+    async def remove_precomputer():
+        main.feed_precomputer = installed_precomputer[0]
+
+    return [
+        Scenario("profile", lambda i: ("POST", "/generate-profile/", profile_body(i))),
+        Scenario("profile_stream", lambda i: ("POST", "/generate-profile/stream", profile_body(i))),
+        Scenario("news_feed", lambda i: ("POST", "/generate-news-feed/", news_feed_body(i))),
+        Scenario("news_feed_stream", lambda i: ("POST", "/generate-news-feed/stream", news_feed_body(i))),
+        Scenario("daily_prompt", lambda i: ("GET", f"/generate-daily-prompt/?context=ctx{i % distinct}", None)),
+        Scenario("daily_prompt_stream", lambda i: ("GET", f"/generate-daily-prompt/stream?context=ctx{i % distinct}", None)),
+        Scenario("dummy_users", lambda i: ("POST", "/generate-dummy-users/", {"count": args.dummy_count})),
+        Scenario("dummy_users_job", lambda i: ("POST", "/generate-dummy-users/jobs/", {"count": args.dummy_count}),
+                 settle=wait_for_jobs),
+        Scenario("dummy_users_job_status", lambda i: ("GET", f"/generate-dummy-users/jobs/{job_ids[0]}", None),
+                 setup=start_job_for_status, settle=wait_for_jobs),
+        Scenario("discover", lambda i: ("POST", "/discover/", {"viewer_id": profile_ids[i % len(profile_ids)],
+                                                                "min_age": 25, "max_age": 35, "limit": 20})),
+        Scenario("discover_upsert", lambda i: ("POST", "/discover/profiles/", {
+            "profiles": [{"id": profile_ids[i % len(profile_ids)], "height_cm": 160 + i % 40}]})),
+        Scenario("dummy_users_job_retry", lambda i: ("POST", f"/generate-dummy-users/jobs/{retry_job_ids[i]}/retry", None),
+                 setup=start_finished_jobs, settle=wait_for_jobs),
+        Scenario("discover_delete", lambda i: ("DELETE", f"/discover/profiles/delete-{i}", None), setup=seed_deletions),
+        Scenario("discover_webhook", lambda i: ("POST", "/discover/webhook", {
+            "type": "UPDATE", "table": "user_profiles",
+            "record": {"id": profile_ids[i % len(profile_ids)], "height_cm": 160 + i % 40}})),
+        Scenario("embeddings_upsert", lambda i: ("POST", "/embeddings/profiles/", {
+            "profiles": [{"id": f"embed-{i % distinct}", "bio": f"Bio number {i} about hiking and jazz."}]})),
+        Scenario("embeddings_search", lambda i: ("POST", "/embeddings/search/", {
+            "profile_id": profile_ids[i % len(profile_ids)], "k": 10})),
+        Scenario("embeddings_search_text", lambda i: ("POST", "/embeddings/search/", {
+            "text": f"Looking for someone into hiking and jazz, number {i % distinct}.", "k": 10})),
+        Scenario("news_feed_activity", lambda i: ("POST", "/news-feed/activity/", {
+            "user_id": f"user-{i % distinct}", "activity": [{"type": "like", "from": f"user {i}"}]}),
+                 setup=install_precomputer, settle=remove_precomputer),
+        Scenario("precompute_stats", lambda i: ("GET", "/precompute/stats", None)),
+        Scenario("llm_stats", lambda i: ("GET", "/llm/stats", None)),
+        Scenario("metrics", lambda i: ("GET", "/metrics", None)),
+        Scenario("ready", lambda i: ("GET", "/ready", None)),
+        Scenario("warmup", lambda i: ("POST", "/warmup", None)),
+    ]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int,
+                       warmup: int) -> Dict[str, Any]:
+    if scenario.setup is not None:
+        prepared = scenario.setup(requests + warmup)
+        if asyncio.iscoroutine(prepared):
+            await prepared
+    for i in range(warmup):
+        # Unmeasured, with indexes past the measured range so per-request fixtures are not used up.
+        method, path, body = scenario.make_request(requests + i)
+        await (await client.request(method, path, json=body)).aread()
+    latencies = np.zeros(requests)
+    statuses: Dict[int, int] = {}
+    next_index = iter(range(requests))
+
+    async def worker():
+        for i in next_index:
+            method, path, body = scenario.make_request(i)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            await response.aread()
+            latencies[i] = time.perf_counter() - started
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    if scenario.settle is not None:
+        await scenario.settle()
+
+    ok = sum(count for status, count in statuses.items() if status < 400)
+    shed = statuses.get(503, 0)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+        "ok": ok,
+        "shed": shed,
+        "errors": requests - ok - shed,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+async def run(main, scenarios: List[Scenario], args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    print(f"{'endpoint':<24} {'conc':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'ok':>6} {'shed':>5} {'err':>5}")
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for concurrency in args.concurrency:
+                for scenario in scenarios:
+                    result = await run_scenario(client, scenario, args.requests, concurrency, args.warmup)
+                    results[f"{scenario.name}@{concurrency}"] = result
+                    print(f"{scenario.name:<24} {concurrency:>5} {result['throughput_rps']:>9.1f} "
+                          f"{result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms "
+                          f"{result['ok']:>6} {result['shed']:>5} {result['errors']:>5}")
+    return results
+
+
+def calibrate(rounds: int = 5) -> float:
+    """Median milliseconds for a fixed CPU workload (JSON round-trips and small matrix products)."""
+    rows = fake_profiles(200)
+    matrix = np.random.default_rng(0).standard_normal((256, 256))
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(5):
+            json.loads(json.dumps(rows))
+            np.linalg.matrix_power(matrix / 16, 8)
+        timings.append(time.perf_counter() - started)
+    return round(float(np.median(timings)) * 1000, 3)
+
+
+def host_fingerprint() -> str:
+    return f"{socket.gethostname()}/{platform.machine()}/{os.cpu_count()}cpu/py{platform.python_version()}"
+
+
+def speed_factor(report: Dict[str, Any], baseline: Dict[str, Any]) -> float:
+    """How much the baseline's times are scaled up before comparing: 1.0 on the baseline's own host."""
+    if baseline.get("host") == report["host"] or not baseline.get("calibration_ms"):
+        return 1.0
+    return max(1.0, report["calibration_ms"] / baseline["calibration_ms"])
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], max_regression: float,
+            latency_slack_ms: float, factor: float = 1.0) -> List[str]:
+    """
+    Returns one message per regression against the baseline's results (an empty list means pass).
+    Throughput is compared as time per request so that, like p95, sub-millisecond endpoints get the
+    absolute `latency_slack_ms` on top of the relative tolerance instead of failing on scheduler noise.
+    Baseline times are multiplied by `factor` (see speed_factor) first.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        current_ms, previous_ms = 1000 / current["throughput_rps"], factor * 1000 / previous["throughput_rps"]
+        if current_ms > previous_ms * (1 + max_regression) + latency_slack_ms / current["concurrency"]:
+            regressions.append(f"{key}: throughput {current['throughput_rps']:.1f} rps vs baseline {previous['throughput_rps']:.1f} rps")
+        if current["p95_ms"] > factor * previous["p95_ms"] * (1 + max_regression) + latency_slack_ms:
+            regressions.append(f"{key}: p95 {current['p95_ms']:.1f} ms vs baseline {previous['p95_ms']:.1f} ms")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{key}: {current['errors']} errors vs baseline {previous['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each endpoint and level")
+    parser.add_argument("--endpoints", nargs="+", help="scenario names to run (default: all)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake Gemini seconds per call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Gemini calls failing with a 500")
+    parser.add_argument("--quota-error-rate", type=float, default=0.0, help="fraction failing with RESOURCE_EXHAUSTED")
+    parser.add_argument("--malformed-json-rate", type=float, default=0.0, help="fraction of news feeds that are not valid JSON")
+    parser.add_argument("--supabase-latency", type=float, default=0.02)
+    parser.add_argument("--supabase-error-rate", type=float, default=0.0)
+    parser.add_argument("--profiles", type=int, default=5000, help="profiles seeded into discovery and embeddings")
+    parser.add_argument("--distinct-prompts", type=int, default=1000, help="distinct inputs per endpoint (controls cache hits)")
+    parser.add_argument("--dummy-count", type=int, default=5, help="profiles per dummy-user request")
+    parser.add_argument("--rpm", type=float, default=1e9, help="GEMINI_RPM_LIMIT for the app under test")
+    parser.add_argument("--tpm", type=float, default=1e12, help="GEMINI_TPM_LIMIT for the app under test")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="CRITICAL")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline instead of comparing")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed relative throughput/p95 regression")
+    parser.add_argument("--latency-slack-ms", type=float, default=5.0, help="absolute p95 slack for very fast endpoints")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app_module = import_app(args, workdir)
+        scenarios = build_scenarios(app_module, args)
+        if args.endpoints:
+            unknown = set(args.endpoints) - {s.name for s in scenarios}
+            if unknown:
+                parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+            scenarios = [s for s in scenarios if s.name in args.endpoints]
+        results = asyncio.run(run(app_module, scenarios, args))
+
+    report = {
+        "run_id": uuid.uuid4().hex,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "host": host_fingerprint(),
+        "calibration_ms": calibrate(),
+        "settings": {name: getattr(args, name) for name in FAKE_SETTINGS} | {"requests": args.requests},
+        "results": results,
+    }
+    target = args.baseline if args.save_baseline else args.output
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    with open(target, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {target}")
+    if args.save_baseline:
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != report["settings"]:
+        print("Warning: the baseline was recorded with different fake-service settings; comparison may be meaningless.")
+    factor = speed_factor(report, baseline)
+    if baseline.get("host") != report["host"]:
+        print(f"Baseline recorded on {baseline.get('host', 'an unknown host')}, not {report['host']}: baseline times "
+              f"scaled by {factor:.2f}x (calibration {report['calibration_ms']:.1f} ms vs "
+              f"{baseline.get('calibration_ms') or 'unknown'}). Use --save-baseline here for a strict comparison.")
+    regressions = compare(results, baseline, args.max_regression, args.latency_slack_ms, factor)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"No regressions against {args.baseline} (tolerance {args.max_regression:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
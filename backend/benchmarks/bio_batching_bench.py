@@ -0,0 +1,83 @@
+"""
+Benchmark: batched vs unbatched /generate-profile/ bio generation under a sign-up burst.
+
+The stub model charges a fixed per-call overhead plus a per-output-item cost, which is roughly
+how Gemini latency behaves. Both modes go through LLMClient with the same concurrency limit;
+the report shows wall time, mean latency and the number of model calls (i.e. quota spent).
+
+Usage (from the backend/ directory):
+    python benchmarks/bio_batching_bench.py --burst 64 --concurrency 4 --overhead 0.3 --per-item 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bio_batcher import ProfileBioBatcher  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+
+
+class StubModel:
+    def __init__(self, overhead: float, per_item: float, malformed_every: int = 0):
+        self.overhead = overhead
+        self.per_item = per_item
+        self.malformed_every = malformed_every
+        self.calls = 0
+
+    def generate(self, prompt_text: str, max_new_tokens: int = 500, response_schema=None) -> str:
+        self.calls += 1
+        indices = [int(i) for i in re.findall(r"^Request (\d+):", prompt_text, re.MULTILINE)]
+        time.sleep(self.overhead + self.per_item * max(1, len(indices)))
+        if not response_schema:
+            return f"A single bio for: {prompt_text[:30]}"
+        if self.malformed_every and self.calls % self.malformed_every == 0:
+            return '[{"index": 0, "profile_bio": "truncated'
+        return json.dumps([{"index": i, "profile_bio": f"Batched bio #{i}"} for i in indices])
+
+
+async def run(model: StubModel, burst: int, concurrency: int, batched: bool, window_ms: float, max_batch: int):
+    client = LLMClient(model.generate, max_concurrency=concurrency, timeout=120)
+    batcher = ProfileBioBatcher(client.generate, window_ms=window_ms, max_batch=max_batch) if batched else None
+    latencies = []
+
+    async def one(i):
+        prompt = f"Create a compelling dating profile bio based on the following user data: name: user{i}."
+        started = time.perf_counter()
+        result = await (batcher.submit(prompt) if batcher else client.generate(prompt, max_new_tokens=200))
+        latencies.append(time.perf_counter() - started)
+        return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(burst)))
+    wall = time.perf_counter() - started
+    client.shutdown()
+    assert all(results), "some requests did not get a bio"
+    return wall, sum(latencies) / len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=64, help="Concurrent /generate-profile/ requests")
+    parser.add_argument("--concurrency", type=int, default=4, help="LLMClient concurrency limit")
+    parser.add_argument("--overhead", type=float, default=0.3, help="Stub per-call overhead in seconds")
+    parser.add_argument("--per-item", type=float, default=0.02, help="Stub cost per generated bio in seconds")
+    parser.add_argument("--window-ms", type=float, default=10.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--malformed-every", type=int, default=0, help="Make every Nth batched response malformed")
+    args = parser.parse_args()
+
+    print(f"burst={args.burst} concurrency={args.concurrency} overhead={args.overhead}s per_item={args.per_item}s")
+    for batched in (False, True):
+        model = StubModel(args.overhead, args.per_item, args.malformed_every)
+        wall, mean_latency = asyncio.run(run(model, args.burst, args.concurrency, batched, args.window_ms, args.max_batch))
+        label = f"batched (max {args.max_batch})" if batched else "unbatched"
+        print(f"{label:>18}: wall {wall:6.2f}s  mean latency {mean_latency * 1000:7.1f} ms  model calls {model.calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: top-K similarity query latency vs corpus size for EmbeddingStore.
+
+For each corpus size, random unit vectors are written to a temporary store (no embedding provider
+calls), then single-query latency is measured for exact search and for the IVF approximate index,
+together with the approximate index's recall@K against exact search.
+
+Usage (from the backend/ directory):
+    python benchmarks/embedding_search_bench.py --sizes 1000 10000 100000 --dim 768 --queries 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import EmbeddingStore, HashingEmbeddingProvider  # noqa: E402
+
+
+def clustered_vectors(rng: np.random.Generator, n: int, dim: int, clusters: int = 64) -> np.ndarray:
+    # Real embeddings are clustered by topic; uniform noise would be a worst case for IVF recall.
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    return centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim} k={args.k} nprobe={args.nprobe} queries={args.queries}")
+    print(f"{'N':>9} {'exact p50':>10} {'exact p95':>10} {'ivf p50':>10} {'ivf p95':>10} {'recall':>7} {'ivf build':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            store = EmbeddingStore(os.path.join(directory, "bench"), HashingEmbeddingProvider(args.dim), ann_threshold=0)
+            vectors = clustered_vectors(rng, size, args.dim)
+            store.upsert_vectors([f"p{i}" for i in range(size)], [None] * size, vectors)
+            queries = vectors[rng.integers(0, size, args.queries)] + 0.1 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+            exact_times, exact_results = [], []
+            for query in queries:
+                started = time.perf_counter()
+                exact_results.append(store.search(query, args.k))
+                exact_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            store.build_ann_index()
+            build_time = time.perf_counter() - started
+
+            ivf_times, recalls = [], []
+            for query, exact in zip(queries, exact_results):
+                started = time.perf_counter()
+                approx = store.search(query, args.k, approximate=True, nprobe=args.nprobe)
+                ivf_times.append(time.perf_counter() - started)
+                recalls.append(len({p for p, _ in approx} & {p for p, _ in exact}) / args.k)
+
+            print(f"{size:>9} {percentile_ms(exact_times, 50):>8.2f}ms {percentile_ms(exact_times, 95):>8.2f}ms "
+                  f"{percentile_ms(ivf_times, 50):>8.2f}ms {percentile_ms(ivf_times, 95):>8.2f}ms "
+                  f"{np.mean(recalls):>7.3f} {build_time:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+`main:app` wired to the offline fakes, for benchmarks that run the app in real server processes
+(uvicorn / serve.py) instead of in-process:
+
+    python serve.py --app fake_app:app --app-dir benchmarks --workers 4
+
+Configured through the environment: FAKE_LLM_LATENCY and FAKE_SUPABASE_LATENCY (seconds). Every
+generated daily prompt is unique (tagged with the worker pid and a counter), so a client can tell how
+many generations happened across all workers from the distinct answers it receives.
+"""
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from fakes import FakeGeminiModel, FakeSupabaseClient  # noqa: E402
+
+
+class TaggedGeminiModel(FakeGeminiModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._generation = itertools.count(1)
+
+    def _answer(self, prompt_text, response_schema):
+        text = super()._answer(prompt_text, response_schema)
+        if "daily question or prompt" in prompt_text:
+            text = f"{text} [pid {os.getpid()} #{next(self._generation)}]"
+        return text
+
+
+# With a real key, warm-up imports the Gemini SDK when it creates the client; the fake skips that, so
+# import the generation types here rather than on the first request.
+from google.generativeai.types import GenerationConfig  # noqa: E402,F401
+
+main.model = TaggedGeminiModel(latency=float(os.getenv("FAKE_LLM_LATENCY", "0.05")), seed=None)
+main.supabase = FakeSupabaseClient(latency=float(os.getenv("FAKE_SUPABASE_LATENCY", "0.02")))
+
+app = main.app
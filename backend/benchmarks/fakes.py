@@ -0,0 +1,238 @@
+"""
+Offline stand-ins for the Gemini model and the Supabase client, used by the API benchmarks.
+
+FakeGeminiModel mimics genai.GenerativeModel.generate_content (plain, schema-constrained and streaming
+calls) and FakeSupabaseClient mimics the table().insert/upsert/select().range().execute() chain used by
+main.py. Both sleep for a configurable latency and can inject failures, so the app's own concurrency,
+caching, quota scheduling and fallback paths run exactly as they do against the real services.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from dummy_users import JSON_STRING_FIELDS, USER_PROFILE_SCHEMA
+
+QUOTA_ERROR_MESSAGE = "429 RESOURCE_EXHAUSTED: Quota exceeded for quota metric 'Generate Content API requests' (fake)"
+
+
+class _Part:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Content:
+    def __init__(self, text: str):
+        self.parts = [_Part(text)]
+
+
+class _Candidate:
+    def __init__(self, text: str):
+        self.content = _Content(text)
+
+
+class _UsageMetadata:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    """The subset of GenerateContentResponse that main.py reads."""
+
+    def __init__(self, text: str, prompt_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.parts = [_Part(text)] if text else []
+        self.candidates = [_Candidate(text)] if text else []
+        self.usage_metadata = _UsageMetadata(prompt_tokens, output_tokens)
+
+
+class FakeGeminiModel:
+    """
+    Answers like gemini-1.5-flash would, shaped by the prompt and the response schema:
+    dummy-user profile arrays, batched bios, news feed lists, daily prompts and profile bios.
+
+    `latency` (+/- `jitter`) seconds are slept per call (spread over the chunks when streaming).
+    `quota_error_rate` of calls raise a RESOURCE_EXHAUSTED error, `error_rate` raise a generic API error,
+    and `malformed_json_rate` of news-feed answers are truncated, non-JSON lists that only the regex
+    fallback can recover.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+                 quota_error_rate: float = 0.0, malformed_json_rate: float = 0.0, stream_chunks: int = 4,
+                 seed: Optional[int] = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self.malformed_json_rate = malformed_json_rate
+        self.stream_chunks = stream_chunks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _roll(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return self._random.random()
+
+    def _chance(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def _delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def generate_content(self, prompt_text: str, generation_config: Any = None, stream: bool = False):
+        roll = self._roll()
+        if roll < self.quota_error_rate:
+            time.sleep(self._delay() / 10)
+            raise Exception(QUOTA_ERROR_MESSAGE)
+        if roll < self.quota_error_rate + self.error_rate:
+            time.sleep(self._delay() / 10)
+            raise Exception("500 INTERNAL: An internal error has occurred (fake)")
+
+        text = self._answer(prompt_text, getattr(generation_config, "response_schema", None))
+        prompt_tokens, output_tokens = len(prompt_text) // 4, len(text) // 4
+        if stream:
+            return self._stream(text, prompt_tokens, output_tokens)
+        time.sleep(self._delay())
+        return FakeResponse(text, prompt_tokens, output_tokens)
+
+    def _stream(self, text: str, prompt_tokens: int, output_tokens: int) -> Iterator[FakeResponse]:
+        size = max(1, -(-len(text) // self.stream_chunks))
+        pause = self._delay() / self.stream_chunks
+        for start in range(0, len(text), size):
+            time.sleep(pause)
+            yield FakeResponse(text[start:start + size])
+        yield FakeResponse("", prompt_tokens, output_tokens)
+
+    def _answer(self, prompt_text: str, response_schema: Any) -> str:
+        if response_schema is USER_PROFILE_SCHEMA or "user profiles for a dating application" in prompt_text:
+            match = re.search(r"Generate (\d+) diverse", prompt_text)
+            return json.dumps(fake_profiles(int(match.group(1)) if match else 1, self._random))
+        if "separate dating profile bios" in prompt_text:
+            count = len(re.findall(r"^Request \d+:", prompt_text, flags=re.MULTILINE))
+            return json.dumps([{"index": i, "profile_bio": f"Batched fake bio #{i}."} for i in range(count)])
+        if "news feed items" in prompt_text:
+            match = re.search(r"Generate (\d+) engaging", prompt_text)
+            items = [f"Fake news feed item {i + 1}" for i in range(int(match.group(1)) if match else 3)]
+            if self._chance() < self.malformed_json_rate:
+                # Single quotes and a cut-off tail: json.loads fails, the regex fallback still finds the items.
+                return "Sure! Here are your items: [" + ", ".join(f"'{item}'" for item in items) + ", 'Fake news"
+            return json.dumps(items)
+        if "daily question or prompt" in prompt_text:
+            return "What's a small ritual that makes your week feel like yours?"
+        return "Curious, warm and always up for a spontaneous weekend trip. Looking for someone to laugh with."
+
+
+def fake_profiles(count: int, rng: Optional[random.Random] = None) -> List[Dict[str, Any]]:
+    """Profiles filled in from USER_PROFILE_SCHEMA, shaped like Gemini's schema-constrained output."""
+    rng = rng or random.Random(0)
+    properties = USER_PROFILE_SCHEMA["items"]["properties"]
+    profiles = []
+    for _ in range(count):
+        token = uuid.uuid4().hex[:12]
+        profile = {}
+        for field, spec in properties.items():
+            kind = spec.get("type")
+            if field == "email":
+                profile[field] = f"fake_{token}@example.com"
+            elif field in JSON_STRING_FIELDS:
+                profile[field] = json.dumps({"favorite_question": f"answer {token}"})
+            elif "enum" in spec:
+                profile[field] = rng.choice(spec["enum"])
+            elif field == "date_of_birth":
+                profile[field] = f"{rng.randint(1985, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            elif kind == "NUMBER":
+                profile[field] = round(rng.uniform(150, 200), 1)
+            elif kind == "INTEGER":
+                profile[field] = rng.randint(0, 10)
+            elif kind == "BOOLEAN":
+                profile[field] = True
+            elif kind == "ARRAY":
+                profile[field] = [f"{field} {rng.randint(1, 20)}" for _ in range(3)]
+            else:
+                profile[field] = f"{field} {token}"
+        profiles.append(profile)
+    return profiles
+
+
+class FakeAPIResponse:
+    def __init__(self, data: List[Dict[str, Any]], error: Any = None):
+        self.data = data
+        self.error = error
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self._client = client
+        self._table = table
+        self._operation = "select"
+        self._rows: List[Dict[str, Any]] = []
+        self._range = None
+
+    def insert(self, rows: Any) -> "FakeQuery":
+        self._operation, self._rows = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows: Any) -> "FakeQuery":
+        self._operation, self._rows = "upsert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def select(self, columns: str = "*") -> "FakeQuery":
+        self._operation = "select"
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self._range = (start, end)
+        return self
+
+    def execute(self) -> FakeAPIResponse:
+        return self._client._execute(self._table, self._operation, self._rows, self._range)
+
+
+class FakeSupabaseClient:
+    """
+    In-memory tables behind the supabase-py query-builder chain. Each execute() sleeps `latency` seconds
+    plus `per_row_latency` per written row, and fails with `error_rate` probability by raising, as
+    postgrest does for network and 5xx errors.
+    """
+
+    def __init__(self, latency: float = 0.02, per_row_latency: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = 0):
+        self.latency = latency
+        self.per_row_latency = per_row_latency
+        self.error_rate = error_rate
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def _execute(self, table: str, operation: str, rows: List[Dict[str, Any]], row_range) -> FakeAPIResponse:
+        time.sleep(self.latency + self.per_row_latency * len(rows))
+        with self._lock:
+            if self._random.random() < self.error_rate:
+                raise Exception("503 Service Unavailable (fake Supabase)")
+            store = self.tables.setdefault(table, {})
+            if operation == "select":
+                data = list(store.values())
+                if row_range is not None:
+                    data = data[row_range[0]:row_range[1] + 1]
+                return FakeAPIResponse(data)
+            written = []
+            for row in rows:
+                row = dict(row)
+                row.setdefault("id", str(uuid.uuid4()))
+                store[row["id"]] = row
+                written.append(row)
+            return FakeAPIResponse(written)
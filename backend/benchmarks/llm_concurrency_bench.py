@@ -0,0 +1,72 @@
+"""
+Load test for LLMClient against a stub Gemini model with injected latency.
+
+Fires a fixed number of requests at several concurrency limits and reports throughput.
+With a blocking model behind the event loop, throughput stays flat at ~1/latency; with
+LLMClient it should scale roughly linearly with the concurrency limit.
+
+Usage (from the backend/ directory):
+    python benchmarks/llm_concurrency_bench.py --requests 64 --latency 0.2 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import LLMClient  # noqa: E402
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel: sleeps for `latency` seconds, then returns fixed text."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def generate_content(self, prompt_text: str) -> str:
+        time.sleep(self.latency)
+        return f"stub response for: {prompt_text[:20]}"
+
+
+async def run_level(model: StubModel, concurrency: int, total_requests: int) -> float:
+    client = LLMClient(lambda prompt, **_: model.generate_content(prompt), max_concurrency=concurrency, timeout=60)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client.generate(f"prompt {i}", max_new_tokens=50) for i in range(total_requests)))
+    elapsed = time.perf_counter() - started
+    client.shutdown()
+    assert all(results), "stub model returned an empty response"
+    return total_requests / elapsed
+
+
+async def run_blocking_baseline(model: StubModel, total_requests: int) -> float:
+    # What the endpoints did before LLMClient: call the model directly inside the coroutine.
+    async def call(i):
+        return model.generate_content(f"prompt {i}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(total_requests)))
+    return total_requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2, help="Injected stub latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    model = StubModel(args.latency)
+    print(f"{args.requests} requests, stub latency {args.latency * 1000:.0f} ms")
+
+    baseline = asyncio.run(run_blocking_baseline(model, args.requests))
+    print(f"{'blocking (old)':>16}: {baseline:8.1f} req/s")
+
+    for concurrency in args.concurrency:
+        throughput = asyncio.run(run_level(model, concurrency, args.requests))
+        print(f"{'concurrency=' + str(concurrency):>16}: {throughput:8.1f} req/s  ({throughput / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
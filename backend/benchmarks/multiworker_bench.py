@@ -0,0 +1,244 @@
+"""
+Benchmark: multi-worker serving (serve.py) against the offline fakes (benchmarks/fake_app.py).
+
+  scaling   - for each worker count, serve.py is started with that many workers and driven by
+              --clients load-generator processes for --duration seconds. The load is cached profile bios
+              and daily prompts, so after warm-up it is CPU-bound request handling plus shared-cache
+              lookups. Reports requests/s and the scaling efficiency relative to one worker. Near-linear
+              scaling needs at least workers + clients free cores; on a machine with fewer cores the
+              numbers only show the overhead of the extra processes.
+  quota     - a burst of distinct /generate-profile/ requests against a small GEMINI_RPM_LIMIT. With the
+              shared state, about GEMINI_RPM_LIMIT calls succeed host-wide. Without it, each worker
+              enforces the limit on its own, so up to workers x the limit succeed.
+  cache     - many concurrent /generate-daily-prompt/ requests. With the shared state, the distinct answers
+              stay close to DAILY_PROMPT_CACHE_VARIANTS across all workers. Without it, each worker fills its
+              own pool.
+
+The quota and cache checks run once with and once without the shared state ("uvicorn --workers N" with
+SHARED_STATE_PATH unset). Results are written to benchmarks/results/multiworker_bench.json.
+
+Usage (from the backend/ directory):
+    python benchmarks/multiworker_bench.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+OFFLINE_ENV = {
+    "GOOGLE_API_KEY": "",
+    "SUPABASE_URL": "",
+    "SUPABASE_SERVICE_ROLE_KEY": "",
+    "DISCOVERY_PRELOAD": "false",
+    "PRECOMPUTE_ENABLED": "false",
+    "EMBEDDING_PROVIDER": "hashing",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """serve.py (shared state) or plain `uvicorn --workers` (per-worker state) running fake_app:app."""
+
+    def __init__(self, workers: int, shared: bool, env: Dict[str, str], workdir: str):
+        self.workers = workers
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = {**os.environ, **OFFLINE_ENV, **env,
+               "EMBEDDING_STORE_PATH": os.path.join(workdir, f"embeddings-{self.port}")}
+        if shared:
+            env.pop("SHARED_STATE_PATH", None)
+            command = [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--app", "fake_app:app",
+                       "--app-dir", BENCHMARKS_DIR, "--shared-state", os.path.join(workdir, f"state-{self.port}.sqlite3")]
+        else:
+            env["SHARED_STATE_PATH"] = ""
+            command = [sys.executable, "-m", "uvicorn", "fake_app:app", "--app-dir", BENCHMARKS_DIR]
+        command += ["--host", "127.0.0.1", "--port", str(self.port), "--workers", str(workers), "--log-level", "warning"]
+        self.process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL)
+
+    def wait_ready(self, timeout: float) -> None:
+        # Fresh connections are spread over the workers by the kernel; wait until every worker answered 200.
+        ready_pids = set()
+        deadline = time.monotonic() + timeout
+        while len(ready_pids) < self.workers:
+            if time.monotonic() > deadline or self.process.poll() is not None:
+                raise RuntimeError(f"{self.workers} worker(s) not ready after {timeout}s (ready: {len(ready_pids)})")
+            try:
+                response = httpx.get(f"{self.url}/ready", timeout=1.0, headers={"Connection": "close"})
+                if response.status_code == 200:
+                    ready_pids.add(response.json()["pid"])
+            except httpx.TransportError:
+                time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# --- Load generation (one process per client, each with `concurrency` connections) ---
+
+def _request(client: httpx.AsyncClient, i: int):
+    if i % 2:
+        return client.get("/generate-daily-prompt/", params={"context": "weekend"})
+    return client.post("/generate-profile/", json={"user_data": {"name": f"user {i % 8}", "hobby": "climbing"}})
+
+
+async def _drive(url: str, concurrency: int, duration: float) -> Dict[str, int]:
+    counts = {"ok": 0, "errors": 0}
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=10.0) as client:
+        async def loop(offset: int):
+            i = offset
+            while time.monotonic() < deadline:
+                try:
+                    response = await _request(client, i)
+                    counts["ok" if response.status_code == 200 else "errors"] += 1
+                except httpx.HTTPError:
+                    counts["errors"] += 1
+                i += concurrency
+        await asyncio.gather(*(loop(offset) for offset in range(concurrency)))
+    return counts
+
+
+def _client_process(url: str, concurrency: int, duration: float, queue) -> None:
+    queue.put(asyncio.run(_drive(url, concurrency, duration)))
+
+
+def measure_throughput(url: str, clients: int, concurrency: int, duration: float) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    processes = [context.Process(target=_client_process, args=(url, concurrency, duration, queue)) for _ in range(clients)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    ok = sum(r["ok"] for r in results)
+    return {"requests": ok, "errors": sum(r["errors"] for r in results), "seconds": round(elapsed, 2),
+            "rps": round(ok / elapsed, 1)}
+
+
+# --- Correctness across workers ---
+
+async def _burst(url: str, requests: List[Any], concurrency: int) -> List[httpx.Response]:
+    # New connection per request so the burst is spread over all workers.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(build):
+        async with semaphore:
+            async with httpx.AsyncClient(base_url=url, timeout=30.0, headers={"Connection": "close"}) as client:
+                return await build(client)
+    return await asyncio.gather(*(send(build) for build in requests))
+
+
+def check_quota(workers: int, shared: bool, rpm: int, burst: int, workdir: str) -> Dict[str, Any]:
+    env = {"GEMINI_RPM_LIMIT": str(rpm), "LLM_TIMEOUT_SECONDS": "1", "LLM_QUOTA_MAX_RETRIES": "0",
+           "PROFILE_CACHE_VARIANTS": "1"}
+    with Server(workers, shared, env, workdir) as server:
+        server.wait_ready(60)
+        requests = [lambda client, i=i: client.post("/generate-profile/", json={"user_data": {"name": f"quota user {i}"}})
+                    for i in range(burst)]
+        responses = asyncio.run(_burst(server.url, requests, concurrency=burst))
+    succeeded = sum(r.status_code == 200 for r in responses)
+    return {"rpm_limit": rpm, "requests": burst, "succeeded": succeeded,
+            "throttled": sum(r.status_code == 503 for r in responses),
+            "allowed_host_wide": rpm, "over_limit_by": max(0, succeeded - rpm)}
+
+
+def check_cache(workers: int, shared: bool, variants: int, requests_count: int, workdir: str) -> Dict[str, Any]:
+    env = {"DAILY_PROMPT_CACHE_VARIANTS": str(variants), "FAKE_LLM_LATENCY": "0.05"}
+    with Server(workers, shared, env, workdir) as server:
+        server.wait_ready(60)
+        requests = [lambda client: client.get("/generate-daily-prompt/", params={"context": "cache check"})
+                    for _ in range(requests_count)]
+        responses = asyncio.run(_burst(server.url, requests, concurrency=8))
+    answers = {r.json()["daily_prompt"] for r in responses if r.status_code == 200}
+    return {"variants": variants, "requests": requests_count, "distinct_answers": len(answers),
+            "generating_workers": len({answer.split("[pid ")[1].split()[0] for answer in answers if "[pid " in answer})}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=None, help="Load-generator processes (default: max workers)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Connections per load-generator process")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rpm", type=int, default=10, help="GEMINI_RPM_LIMIT for the quota check")
+    parser.add_argument("--variants", type=int, default=5, help="DAILY_PROMPT_CACHE_VARIANTS for the cache check")
+    parser.add_argument("--skip-scaling", action="store_true")
+    parser.add_argument("--skip-checks", action="store_true")
+    args = parser.parse_args()
+    clients = args.clients or max(args.workers)
+
+    result: Dict[str, Any] = {"cpu_count": os.cpu_count(), "clients": clients, "concurrency": args.concurrency,
+                              "duration": args.duration, "scaling": [], "checks": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        if not args.skip_scaling:
+            base_rps: Optional[float] = None
+            print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'efficiency':>10} {'errors':>7}")
+            for workers in args.workers:
+                with Server(workers, True, {}, workdir) as server:
+                    server.wait_ready(120)
+                    run = measure_throughput(server.url, clients, args.concurrency, args.duration)
+                base_rps = base_rps or run["rps"]
+                run.update(workers=workers, speedup=round(run["rps"] / base_rps, 2),
+                           efficiency=round(run["rps"] / base_rps / workers, 2))
+                result["scaling"].append(run)
+                print(f"{workers:>7} {run['rps']:>9.1f} {run['speedup']:>7.2f}x {run['efficiency']:>10.2f} {run['errors']:>7}")
+            cores_needed = max(args.workers) + clients
+            result["scaling_conclusive"] = (os.cpu_count() or 1) >= cores_needed
+            if not result["scaling_conclusive"]:
+                print(f"Only {os.cpu_count()} core(s) for up to {cores_needed} processes: scaling is not measurable here.")
+
+        if not args.skip_checks:
+            workers = max(args.workers)
+            for shared in (True, False):
+                label = "shared" if shared else "per_worker"
+                quota = check_quota(workers, shared, args.rpm, burst=args.rpm * workers * 2, workdir=workdir)
+                cache = check_cache(workers, shared, args.variants, requests_count=50 * workers, workdir=workdir)
+                result["checks"][label] = {"workers": workers, "quota": quota, "cache": cache}
+                print(f"{label:>10} ({workers} workers): quota {quota['succeeded']}/{quota['requests']} succeeded "
+                      f"(limit {quota['rpm_limit']}/min); cache {cache['distinct_answers']} distinct answers "
+                      f"from {cache['generating_workers']} worker(s) (pool of {cache['variants']})")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, "multiworker_bench.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
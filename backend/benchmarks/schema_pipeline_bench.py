@@ -0,0 +1,108 @@
+"""
+Micro-benchmark: parsing and post-processing of generated dummy-user profiles.
+
+Compares the original per-row post-processing (rebuilding the key set and calling datetime.now() per
+profile, json.loads per JSON-string field, no type checks) with the compiled schema pipeline in
+llm_json.py, and times the tolerant parser on truncated output and response encoding.
+Reports profiles per second for each stage.
+
+Usage (from the backend/ directory):
+    python benchmarks/schema_pipeline_bench.py --profiles 5000 --batch 50 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import llm_json  # noqa: E402
+from dummy_users import JSON_STRING_FIELDS, USER_PROFILE_SCHEMA, postprocess_dummy_profiles  # noqa: E402
+from fakes import fake_profiles  # noqa: E402
+
+
+def legacy_postprocess(raw_profiles):
+    """postprocess_dummy_profiles as it was before the compiled schema, for comparison."""
+    rows = []
+    for profile_data in raw_profiles:
+        profile_data['id'] = str(uuid.uuid4())
+        profile_data['created_at'] = datetime.now(timezone.utc).isoformat()
+        profile_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+        if 'email' not in profile_data or not profile_data['email']:
+            profile_data['email'] = f"dummy_user_{uuid.uuid4().hex[:8]}@example.com"
+        for field in JSON_STRING_FIELDS:
+            if field in profile_data and isinstance(profile_data[field], str):
+                try:
+                    profile_data[field] = json.loads(profile_data[field])
+                except json.JSONDecodeError:
+                    profile_data[field] = {}
+        valid_keys = set(USER_PROFILE_SCHEMA["items"]["properties"].keys())
+        valid_keys.update(['id', 'created_at', 'updated_at'])
+        rows.append({k: v for k, v in profile_data.items() if k in valid_keys})
+    return rows
+
+
+def legacy_pipeline(batches):
+    return sum(len(legacy_postprocess(json.loads(raw))) for raw in batches)
+
+
+def compiled_pipeline(batches):
+    total = 0
+    for raw in batches:
+        profiles, _ = llm_json.parse_llm_json(raw)
+        total += len(postprocess_dummy_profiles(profiles))
+    return total
+
+
+def truncated_pipeline(batches):
+    # Every batch cut off mid-way through its last profile: the strict parse fails, the salvage path runs.
+    total = 0
+    for raw in batches:
+        profiles, _ = llm_json.parse_llm_json(raw[:-len(raw) // (2 * raw.count('"email"'))])
+        total += len(postprocess_dummy_profiles(profiles))
+    return total
+
+
+def bench(name, fn, batches, repeat):
+    best, processed = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processed = fn(batches)
+        best = min(best, time.perf_counter() - start)
+    rate = processed / best if best else float("inf")
+    print(f"{name:<34} {processed:>7} profiles  {best * 1000:8.1f} ms  {rate:>10,.0f} profiles/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=50, help="Profiles per generated JSON array (one Gemini call)")
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N runs is reported")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    batches = [json.dumps(fake_profiles(args.batch, rng)) for _ in range(max(1, args.profiles // args.batch))]
+    print(f"{len(batches)} batches of {args.batch} profiles, orjson {'enabled' if llm_json.orjson else 'not installed'}\n")
+
+    legacy = bench("legacy json.loads + per-row loop", legacy_pipeline, batches, args.repeat)
+    compiled = bench("compiled schema pipeline", compiled_pipeline, batches, args.repeat)
+    bench("compiled, truncated output", truncated_pipeline, batches, args.repeat)
+    print(f"\nspeedup (compiled vs legacy): {compiled / legacy:.2f}x")
+
+    rows = postprocess_dummy_profiles(json.loads(batches[0]))
+    for name, encode in (("json.dumps", lambda: json.dumps(rows).encode("utf-8")), ("llm_json.dumps_bytes", lambda: llm_json.dumps_bytes(rows))):
+        start = time.perf_counter()
+        for _ in range(200):
+            encode()
+        elapsed = time.perf_counter() - start
+        print(f"encode {name:<27} {200 * len(rows) / elapsed:>33,.0f} profiles/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: worker cold start.
+
+For each run, in a fresh interpreter:
+  import    - time to `import main`, and whether the Gemini/Supabase SDKs were imported by it
+  uvicorn   - time from spawning `uvicorn main:app` to the first answered request, and to GET /ready = 200
+              (lifespan startup plus the background warm-up that creates the clients)
+
+By default the clients get offline placeholder credentials: they are created (SDK imports, connection
+pool) exactly as in production, but nothing connects anywhere. Use --real-env to keep the environment
+and .env as they are. Each run is appended to benchmarks/results/startup_history.jsonl for tracking.
+
+Usage (from the backend/ directory):
+    python benchmarks/startup_bench.py --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+OFFLINE_ENV = {
+    "GOOGLE_API_KEY": "offline-benchmark-key",
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_SERVICE_ROLE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.offline",
+    "DISCOVERY_PRELOAD": "false",
+    "PRECOMPUTE_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+}
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"import_seconds": elapsed,
+                  "genai_imported": "google.generativeai" in sys.modules,
+                  "supabase_imported": "supabase" in sys.modules}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env) -> dict:
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_uvicorn(env, timeout: float) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                               cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_response = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - started < timeout and ready is None:
+                try:
+                    response = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                if first_response is None:
+                    first_response = time.perf_counter() - started
+                if response.status_code == 200:
+                    ready = time.perf_counter() - started
+                else:
+                    time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"first_request_seconds": first_response, "ready_seconds": ready}
+
+
+def summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {"min": round(min(values), 4), "median": round(statistics.median(values), 4), "max": round(max(values), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for a worker to become ready")
+    parser.add_argument("--real-env", action="store_true", help="Use the current environment and .env credentials")
+    parser.add_argument("--skip-uvicorn", action="store_true")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.real_env:
+        env.update(OFFLINE_ENV)
+
+    imports, servers = [], []
+    for run in range(args.runs):
+        imports.append(measure_import(env))
+        if not args.skip_uvicorn:
+            servers.append(measure_uvicorn(env, args.timeout))
+        print(f"run {run + 1}: import {imports[-1]['import_seconds'] * 1000:.0f} ms"
+              + (f", first request {servers[-1]['first_request_seconds'] * 1000:.0f} ms, ready "
+                 f"{(servers[-1]['ready_seconds'] or float('nan')) * 1000:.0f} ms" if servers else ""))
+
+    result = {
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "runs": args.runs,
+        "offline": not args.real_env,
+        "import_seconds": summarize([r["import_seconds"] for r in imports]),
+        "sdks_imported_by_main": imports[-1]["genai_imported"] or imports[-1]["supabase_imported"],
+        "first_request_seconds": summarize([r["first_request_seconds"] for r in servers]),
+        "ready_seconds": summarize([r["ready_seconds"] for r in servers]),
+    }
+    print(json.dumps(result, indent=2))
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, "startup_history.jsonl"), "a") as f:
+        f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
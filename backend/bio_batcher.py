@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from llm_scheduler import LLMThrottledError
+
+logger = logging.getLogger(__name__)
+
+# Schema for a batched call: one object per input prompt, echoed back with its index so the
+# results can be matched to waiting requests even if Gemini reorders or drops some of them.
+BATCHED_BIO_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER", "description": "The number of the request this bio answers"},
+            "profile_bio": {"type": "STRING", "description": "The dating profile bio for that request"},
+        },
+        "required": ["index", "profile_bio"],
+    },
+}
+
+
+def build_batched_prompt(prompts: List[str]) -> str:
+    parts = [
+        f"You will write {len(prompts)} separate dating profile bios, one for each numbered request below. "
+        "Treat every request independently. Return a JSON array with exactly one object per request, "
+        "each containing the request's 'index' and the generated 'profile_bio'."
+    ]
+    for index, prompt in enumerate(prompts):
+        parts.append(f"Request {index}: {prompt}")
+    return "\n\n".join(parts)
+
+
+def parse_batched_response(raw: Optional[str], expected: int) -> Dict[int, str]:
+    """Returns {index: bio} for every well-formed item in a batched response; malformed items are skipped."""
+    if not raw:
+        return {}
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError:
+        logger.warning("Batched bio response was not valid JSON (%d chars).", len(raw))
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    bios = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index, bio = item.get("index"), item.get("profile_bio")
+        if isinstance(index, int) and 0 <= index < expected and isinstance(bio, str) and bio.strip():
+            bios.setdefault(index, bio.strip())
+    return bios
+
+
+class ProfileBioBatcher:
+    """
+    Micro-batches concurrent profile-bio prompts into a single structured Gemini call.
+
+    The first prompt to arrive opens a window of `window_ms`; everything submitted before it closes
+    (up to `max_batch` prompts) is sent as one request using BATCHED_BIO_SCHEMA. Prompts whose bio is
+    missing or malformed in the batched output fall back to an individual call; if the scheduler sheds
+    that call, its caller gets the LLMThrottledError, other failures resolve to None.
+    """
+
+    def __init__(self, generate: Callable[..., Awaitable[Optional[str]]], window_ms: float = 10.0,
+                 max_batch: int = 8, max_new_tokens_per_item: int = 200):
+        self.generate = generate
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_new_tokens_per_item = max_new_tokens_per_item
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.batches_sent = 0
+        self.items_batched = 0
+        self.fallbacks = 0
+
+    async def submit(self, prompt_text: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt_text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        # Shielded so one caller going away does not cancel the batch for the others.
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            if len(batch) == 1:
+                bios = {}
+            else:
+                self.batches_sent += 1
+                self.items_batched += len(batch)
+                raw = await self.generate(
+                    build_batched_prompt([prompt for prompt, _ in batch]),
+                    max_new_tokens=self.max_new_tokens_per_item * len(batch),
+                    response_schema=BATCHED_BIO_SCHEMA,
+                )
+                bios = parse_batched_response(raw, len(batch))
+                if len(bios) < len(batch):
+                    logger.warning("Batched bio call returned %d/%d usable bios; falling back for the rest.", len(bios), len(batch))
+
+            fallbacks = [(index, prompt) for index, (prompt, _) in enumerate(batch) if index not in bios]
+            if len(batch) > 1:
+                self.fallbacks += len(fallbacks)
+            results = await asyncio.gather(
+                *(self.generate(prompt, max_new_tokens=self.max_new_tokens_per_item) for _, prompt in fallbacks),
+                return_exceptions=True,
+            )
+            throttled = {}
+            for (index, _), result in zip(fallbacks, results):
+                if isinstance(result, LLMThrottledError):
+                    # Surfaced to the caller (503 + Retry-After) instead of being reported as an empty bio.
+                    throttled[index] = result
+                else:
+                    bios[index] = None if isinstance(result, BaseException) else result
+
+            for index, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if index in throttled:
+                    future.set_exception(throttled[index])
+                else:
+                    future.set_result(bios.get(index))
+        except Exception as e:
+            if isinstance(e, LLMThrottledError):
+                logger.warning("Profile bio batch of %d shed: %s", len(batch), e)  # Handled as a 503 per caller.
+            else:
+                logger.error("Profile bio batch failed: %s", e, exc_info=True)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "batches_sent": self.batches_sent,
+            "items_batched": self.items_batched,
+            "fallbacks": self.fallbacks,
+            "pending": len(self._pending),
+        }
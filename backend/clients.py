@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LazyClient(Generic[T]):
+    """
+    A client created on first use instead of at import time, so a worker only pays for the SDKs its
+    requests actually touch. get() is thread-safe (endpoints reach clients from worker threads) and
+    returns None when the client is not configured or creating it failed; a failed creation is retried
+    at most every `retry_interval` seconds. `close` is called with the instance on shutdown.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], enabled: bool = True,
+                 close: Optional[Callable[[T], None]] = None, retry_interval: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.enabled = enabled
+        self.close_fn = close
+        self.retry_interval = retry_interval
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        self._error: Optional[str] = None
+        self._failed_at: Optional[float] = None
+        self._init_seconds: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if not self.enabled:
+            return "disabled"
+        if self._instance is not None:
+            return "ready"
+        return "failed" if self._error else "not_started"
+
+    def get(self) -> Optional[T]:
+        if self._instance is not None or not self.enabled:
+            return self._instance
+        with self._lock:
+            retry_due = self._failed_at is None or time.monotonic() - self._failed_at >= self.retry_interval
+            if self._instance is None and retry_due:
+                started = time.perf_counter()
+                try:
+                    self._instance = self.factory()
+                    self._error = None
+                    self._init_seconds = round(time.perf_counter() - started, 4)
+                    logger.info("%s client initialized in %.0f ms.", self.name, self._init_seconds * 1000)
+                except Exception as e:
+                    self._error, self._failed_at = str(e), time.monotonic()
+                    logger.error("Error initializing %s client: %s", self.name, e, exc_info=True)
+        return self._instance
+
+    async def aget(self) -> Optional[T]:
+        """get() for async code: only creating the client (SDK import included) is moved off the event loop."""
+        if self._instance is not None or not self.enabled:
+            return self._instance
+        return await asyncio.to_thread(self.get)
+
+    def close(self) -> None:
+        with self._lock:
+            instance, self._instance = self._instance, None
+        if instance is not None and self.close_fn is not None:
+            try:
+                self.close_fn(instance)
+            except Exception as e:
+                logger.warning("Error closing %s client: %s", self.name, e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "init_seconds": self._init_seconds, "error": self._error}
+
+
+# --- Factories (SDK imports happen here, on first use) ---
+
+def create_gemini_model(api_key: str, model_name: str) -> Any:
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key) # Pass the key explicitly
+    return genai.GenerativeModel(model_name)
+
+
+def create_http_pool(max_connections: int, max_keepalive: int, keepalive_expiry: float, timeout: float) -> Any:
+    """Keep-alive connection pool shared by every Supabase request of this worker."""
+    import httpx
+
+    try:
+        import h2  # noqa: F401  Optional: multiplexes requests over fewer connections.
+        http2 = True
+    except ImportError:
+        http2 = False
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                          keepalive_expiry=keepalive_expiry)
+    return httpx.Client(limits=limits, timeout=timeout, http2=http2, follow_redirects=True)
+
+
+def create_supabase_client(url: str, key: str, http_client: Any) -> Any:
+    from supabase import ClientOptions, create_client
+
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
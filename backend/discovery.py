@@ -0,0 +1,315 @@
+import logging
+import string
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from dummy_users import USER_PROFILE_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_PROPERTIES = USER_PROFILE_SCHEMA["items"]["properties"]
+
+# Single-choice fields, stored as int16 codes into the schema's enum list (-1 = unknown).
+ENUM_FIELDS = [
+    "gender_identity",
+    "sexual_orientation",
+    "smoking_habits",
+    "drinking_habits",
+    "attachment_style",
+    "marital_status",
+    "education_level",
+    "monogamy_vs_polyamory_preferences",
+]
+
+# Free-text list fields, stored as a multi-hot uint8 matrix over a vocabulary that grows as values appear,
+# up to `max_vocabulary` labels per field. Later labels share OTHER_COLUMN, which never contributes to scores.
+MULTI_HOT_FIELDS = ["hobbies_and_interests", "love_languages"]
+OTHER_COLUMN = 0
+MAX_LABEL_LENGTH = 64
+
+# Returned with each result so the client does not need a second round-trip for the card view.
+SUMMARY_FIELDS = ["display_name", "profile_picture_url", "gender_identity", "location_zip_code", "bio"]
+
+# Columns needed to build the matrix, used when loading from Supabase.
+DISCOVERY_COLUMNS = ["id", "date_of_birth", "height_cm"] + ENUM_FIELDS + MULTI_HOT_FIELDS + [
+    field for field in SUMMARY_FIELDS if field not in ENUM_FIELDS
+]
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _normalize_label(value: Any) -> str:
+    """Lower-cased, with whitespace collapsed and surrounding punctuation stripped, so "Hiking!" == " hiking"."""
+    return " ".join(str(value).lower().split()).strip(string.punctuation + " ")[:MAX_LABEL_LENGTH]
+
+
+def _parse_birth_day(value: Any) -> float:
+    """Days since the Unix epoch for a 'YYYY-MM-DD' (or ISO datetime) string, NaN if unparseable."""
+    if not value:
+        return np.nan
+    try:
+        return float((datetime.fromisoformat(str(value)[:10]).date() - _EPOCH).days)
+    except ValueError:
+        return np.nan
+
+
+class ProfileFeatureMatrix:
+    """
+    Column-oriented, in-memory feature store over user_profiles used by /discover/.
+
+    Each feature lives in its own NumPy array indexed by row, so filtering and scoring a query is a
+    handful of vectorized operations over all candidates instead of a Python loop. Rows are updated in
+    place by upsert()/remove(); removed rows are recycled, and arrays grow by doubling, so the matrix
+    never has to be rebuilt from scratch.
+
+    Each multi-hot field has at most `max_vocabulary` columns plus OTHER_COLUMN, so a stream of unique
+    free-text values cannot grow the matrix without bound.
+    """
+
+    def __init__(self, initial_capacity: int = 1024, max_vocabulary: int = 256):
+        self.max_vocabulary = max_vocabulary
+        self._capacity = initial_capacity
+        self._size = 0
+        self._free_rows: List[int] = []
+        self._row_of: Dict[str, int] = {}
+        self._ids = np.empty(initial_capacity, dtype=object)
+        self._active = np.zeros(initial_capacity, dtype=bool)
+        self._birth_day = np.full(initial_capacity, np.nan, dtype=np.float64)
+        self._height = np.full(initial_capacity, np.nan, dtype=np.float32)
+        self._summaries: List[Optional[Dict[str, Any]]] = [None] * initial_capacity
+
+        self._enum_vocab = {
+            field: {_normalize_label(v): i for i, v in enumerate(_PROFILE_PROPERTIES[field].get("enum", []))}
+            for field in ENUM_FIELDS
+        }
+        self._enum_codes = {field: np.full(initial_capacity, -1, dtype=np.int16) for field in ENUM_FIELDS}
+
+        self._multi_vocab: Dict[str, Dict[str, int]] = {field: {} for field in MULTI_HOT_FIELDS}
+        self._multi_overflow = {field: 0 for field in MULTI_HOT_FIELDS}
+        width = min(16, max_vocabulary + 1)
+        self._multi_hot = {field: np.zeros((initial_capacity, width), dtype=np.uint8) for field in MULTI_HOT_FIELDS}
+        self._multi_count = {field: np.zeros(initial_capacity, dtype=np.int16) for field in MULTI_HOT_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, profile_id: str) -> bool:
+        return profile_id in self._row_of
+
+    # --- Incremental updates ---
+
+    def upsert(self, profile: Dict[str, Any]) -> None:
+        profile_id = profile.get("id")
+        if not profile_id:
+            return
+        profile_id = str(profile_id)
+        row = self._row_of.get(profile_id)
+        if row is None:
+            row = self._allocate_row()
+            self._row_of[profile_id] = row
+            self._ids[row] = profile_id
+            self._active[row] = True
+            self._summaries[row] = {}
+
+        # Partial updates only touch the columns present in `profile`.
+        if "date_of_birth" in profile:
+            self._birth_day[row] = _parse_birth_day(profile["date_of_birth"])
+        if "height_cm" in profile:
+            try:
+                self._height[row] = float(profile["height_cm"])
+            except (TypeError, ValueError):
+                self._height[row] = np.nan
+        for field in ENUM_FIELDS:
+            if field in profile:
+                self._enum_codes[field][row] = self._enum_vocab[field].get(_normalize_label(profile[field]), -1)
+        for field in MULTI_HOT_FIELDS:
+            if field in profile:
+                self._set_multi_hot(field, row, profile[field] or [])
+        summary = self._summaries[row]
+        for field in SUMMARY_FIELDS:
+            if field in profile:
+                summary[field] = profile[field]
+
+    def upsert_many(self, profiles: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for profile in profiles:
+            self.upsert(profile)
+            count += 1
+        return count
+
+    def remove(self, profile_id: str) -> bool:
+        row = self._row_of.pop(str(profile_id), None)
+        if row is None:
+            return False
+        self._active[row] = False
+        self._ids[row] = None
+        self._birth_day[row] = np.nan
+        self._height[row] = np.nan
+        self._summaries[row] = None
+        for field in ENUM_FIELDS:
+            self._enum_codes[field][row] = -1
+        for field in MULTI_HOT_FIELDS:
+            self._multi_hot[field][row] = 0
+            self._multi_count[field][row] = 0
+        self._free_rows.append(row)
+        return True
+
+    def _allocate_row(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+        if self._size == self._capacity:
+            self._grow(self._capacity * 2)
+        row = self._size
+        self._size += 1
+        return row
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - self._capacity
+        self._ids = np.concatenate([self._ids, np.empty(extra, dtype=object)])
+        self._active = np.concatenate([self._active, np.zeros(extra, dtype=bool)])
+        self._birth_day = np.concatenate([self._birth_day, np.full(extra, np.nan)])
+        self._height = np.concatenate([self._height, np.full(extra, np.nan, dtype=np.float32)])
+        self._summaries.extend([None] * extra)
+        for field in ENUM_FIELDS:
+            self._enum_codes[field] = np.concatenate([self._enum_codes[field], np.full(extra, -1, dtype=np.int16)])
+        for field in MULTI_HOT_FIELDS:
+            matrix = self._multi_hot[field]
+            self._multi_hot[field] = np.vstack([matrix, np.zeros((extra, matrix.shape[1]), dtype=np.uint8)])
+            self._multi_count[field] = np.concatenate([self._multi_count[field], np.zeros(extra, dtype=np.int16)])
+        self._capacity = capacity
+
+    def _set_multi_hot(self, field: str, row: int, values: Any) -> None:
+        if isinstance(values, str):
+            values = [values]
+        vocab = self._multi_vocab[field]
+        columns = set()
+        for value in values:
+            label = _normalize_label(value)
+            if not label:
+                continue
+            column = vocab.get(label)
+            if column is None:
+                if len(vocab) < self.max_vocabulary:
+                    column = vocab[label] = len(vocab) + 1
+                else:
+                    column = OTHER_COLUMN
+                    self._multi_overflow[field] += 1
+            columns.add(column)
+
+        matrix = self._multi_hot[field]
+        if len(vocab) + 1 > matrix.shape[1]:
+            new_width = min(max(len(vocab) + 1, matrix.shape[1] * 2), self.max_vocabulary + 1)
+            matrix = np.hstack([matrix, np.zeros((matrix.shape[0], new_width - matrix.shape[1]), dtype=np.uint8)])
+            self._multi_hot[field] = matrix
+        matrix[row] = 0
+        if columns:
+            matrix[row, list(columns)] = 1
+        self._multi_count[field][row] = len(columns)
+
+    # --- Queries ---
+
+    def _codes_for(self, field: str, labels: Optional[List[str]]) -> Optional[np.ndarray]:
+        if not labels:
+            return None
+        vocab = self._enum_vocab[field]
+        return np.array([vocab[l] for l in map(_normalize_label, labels) if l in vocab], dtype=np.int16)
+
+    def _columns_for(self, field: str, labels: Optional[List[str]]) -> List[int]:
+        vocab = self._multi_vocab[field]
+        return sorted({vocab[l] for l in map(_normalize_label, labels or []) if l in vocab})
+
+    def _preferences_of(self, profile_id: str, field: str) -> List[int]:
+        row = self._row_of.get(profile_id)
+        if row is None:
+            return []
+        return [column for column in np.flatnonzero(self._multi_hot[field][row]).tolist() if column != OTHER_COLUMN]
+
+    def query(self, viewer_id: Optional[str] = None, enum_filters: Optional[Dict[str, List[str]]] = None,
+              min_age: Optional[float] = None, max_age: Optional[float] = None,
+              min_height_cm: Optional[float] = None, max_height_cm: Optional[float] = None,
+              interests: Optional[Dict[str, List[str]]] = None, exclude_ids: Optional[List[str]] = None,
+              limit: int = 20, offset: int = 0, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Filters and ranks every active profile in one vectorized pass.
+
+        `enum_filters` maps an ENUM_FIELDS name to its accepted values. `interests` maps a MULTI_HOT_FIELDS
+        name to preferred values; if omitted for a field, the viewer's own values are used. The score is the
+        sum over multi-hot fields of the fraction of preferred values the candidate shares.
+        """
+        n = self._size
+        mask = self._active[:n].copy()
+
+        for field, labels in (enum_filters or {}).items():
+            codes = self._codes_for(field, labels)
+            if codes is not None:
+                mask &= np.isin(self._enum_codes[field][:n], codes)
+
+        if min_age is not None or max_age is not None:
+            today_day = ((today or date.today()) - _EPOCH).days
+            age = (today_day - self._birth_day[:n]) / 365.25
+            # NaN ages compare False, so profiles without a birth date drop out of age-filtered queries.
+            if min_age is not None:
+                mask &= age >= min_age
+            if max_age is not None:
+                mask &= age < max_age + 1
+        if min_height_cm is not None:
+            mask &= self._height[:n] >= min_height_cm
+        if max_height_cm is not None:
+            mask &= self._height[:n] <= max_height_cm
+
+        for profile_id in (exclude_ids or []) + ([viewer_id] if viewer_id else []):
+            row = self._row_of.get(str(profile_id))
+            if row is not None:
+                mask[row] = False
+
+        scores = np.zeros(n, dtype=np.float32)
+        for field in MULTI_HOT_FIELDS:
+            requested = (interests or {}).get(field)
+            columns = self._columns_for(field, requested) if requested else (
+                self._preferences_of(viewer_id, field) if viewer_id else [])
+            if columns:
+                overlap = self._multi_hot[field][:n, columns].sum(axis=1, dtype=np.float32)
+                scores += overlap / len(columns)
+
+        candidates = np.flatnonzero(mask)
+        total = int(candidates.size)
+        end = min(offset + limit, total)
+        if offset >= end:
+            return {"total_matches": total, "offset": offset, "limit": limit, "profiles": []}
+
+        # Ranked by score, ties broken by row so every page of the same query sees the same order.
+        negated = -scores[candidates]
+        if end < total:
+            # Only the first `end` ranks are needed: everything better than the end-th score, then the
+            # lowest-row ties (candidates are in row order, so flatnonzero already returns them first).
+            threshold = np.partition(negated, end - 1)[end - 1]
+            better = np.flatnonzero(negated < threshold)
+            tied = np.flatnonzero(negated == threshold)[:end - better.size]
+            top = np.concatenate((better, tied))
+        else:
+            top = np.arange(total)
+        ranked = top[np.lexsort((top, negated[top]))][offset:end]
+
+        today_day = ((today or date.today()) - _EPOCH).days
+        profiles = []
+        for index in ranked:
+            row = candidates[index]
+            birth_day = self._birth_day[row]
+            profiles.append({
+                "id": self._ids[row],
+                "score": round(float(scores[row]), 4),
+                "age": None if np.isnan(birth_day) else int((today_day - birth_day) // 365.25),
+                **self._summaries[row],
+            })
+        return {"total_matches": total, "offset": offset, "limit": limit, "profiles": profiles}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "profiles": len(self),
+            "capacity": self._capacity,
+            "vocabulary": {field: len(vocab) for field, vocab in self._multi_vocab.items()},
+            "max_vocabulary": self.max_vocabulary,
+            "vocabulary_overflow": dict(self._multi_overflow),
+        }
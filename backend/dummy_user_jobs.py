@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import random
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from dummy_users import USER_PROFILE_SCHEMA, build_dummy_users_prompt, postprocess_dummy_profiles
+from llm_json import parse_llm_json
+from llm_scheduler import LLMThrottledError
+from observability import timed
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkState:
+    """Progress of one chunk of a dummy-user job (one Gemini call for `size` profiles)."""
+
+    def __init__(self, index: int, size: int):
+        self.index = index
+        self.size = size
+        self.status = "pending"  # pending -> running -> done | failed
+        self.attempts = 0
+        self.generated = 0
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"index": self.index, "size": self.size, "status": self.status, "attempts": self.attempts,
+                "generated": self.generated, "error": self.error}
+
+
+class DummyUserJob:
+    def __init__(self, count: int, chunk_size: int):
+        self.id = str(uuid.uuid4())
+        self.count = count
+        self.chunk_size = chunk_size
+        self.status = "queued"  # queued -> running -> completed | completed_with_errors
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.finished_at: Optional[str] = None
+        self.chunks = [ChunkState(i, min(chunk_size, count - start)) for i, start in enumerate(range(0, count, chunk_size))]
+        self.generated = 0
+        self.inserted = 0
+        self.duplicate_emails = 0
+        self.seen_emails: Set[str] = set()
+        # Rows waiting for the next full insert batch, and rows whose insert batch failed after all retries.
+        self.pending_rows: List[Dict[str, Any]] = []
+        self.failed_rows: List[Dict[str, Any]] = []
+        self.insert_lock = asyncio.Lock()
+
+    def to_dict(self, include_chunks: bool = False) -> Dict[str, Any]:
+        chunk_counts: Dict[str, int] = {}
+        for chunk in self.chunks:
+            chunk_counts[chunk.status] = chunk_counts.get(chunk.status, 0) + 1
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "count": self.count,
+            "chunk_size": self.chunk_size,
+            "chunks": chunk_counts,
+            "generated": self.generated,
+            "inserted": self.inserted,
+            "duplicate_emails": self.duplicate_emails,
+            "failed_rows": len(self.failed_rows),
+            "progress": self.inserted / self.count if self.count else 1.0,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if include_chunks:
+            data["failed_chunks"] = [chunk.to_dict() for chunk in self.chunks if chunk.status == "failed"]
+        return data
+
+
+class DummyUserJobManager:
+    """
+    Runs large dummy-user generations as background jobs.
+
+    The requested count is split into chunks of `chunk_size` profiles, each generated by its own Gemini
+    call with at most `max_parallel_chunks` in flight. Every chunk is post-processed as soon as it
+    finishes, emails are de-duplicated across the whole job, and rows are upserted into Supabase in
+    batches of `insert_batch_size`. Chunks and insert batches retry independently with backoff; whatever
+    still fails can be retried later with retry() without rerunning the chunks that succeeded.
+
+    `generate(prompt, max_new_tokens=..., response_schema=...)` is an awaitable LLM call and
+    `upsert_rows(rows)` a blocking Supabase write that raises on failure; it is run in a worker thread.
+    `on_rows_inserted(rows)`, if given, is called on the event loop after each successful batch.
+    """
+
+    def __init__(self, generate: Callable[..., Awaitable[Optional[str]]], upsert_rows: Callable[[List[Dict[str, Any]]], Any],
+                 chunk_size: int = 20, max_parallel_chunks: int = 4, insert_batch_size: int = 500,
+                 max_chunk_attempts: int = 3, max_insert_attempts: int = 3, retry_base_delay: float = 1.0,
+                 max_jobs_retained: int = 100, on_rows_inserted: Optional[Callable[[List[Dict[str, Any]]], Any]] = None):
+        self.generate = generate
+        self.upsert_rows = upsert_rows
+        self.on_rows_inserted = on_rows_inserted
+        self.chunk_size = chunk_size
+        self.max_parallel_chunks = max_parallel_chunks
+        self.insert_batch_size = insert_batch_size
+        self.max_chunk_attempts = max_chunk_attempts
+        self.max_insert_attempts = max_insert_attempts
+        self.retry_base_delay = retry_base_delay
+        self.max_jobs_retained = max_jobs_retained
+        self._jobs: "OrderedDict[str, DummyUserJob]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, count: int, chunk_size: Optional[int] = None) -> DummyUserJob:
+        job = DummyUserJob(count, chunk_size or self.chunk_size)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs_retained:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ("queued", "running"):
+                break
+            del self._jobs[oldest_id]
+        self._tasks[job.id] = asyncio.ensure_future(self._run(job, job.chunks))
+        logger.info("Started dummy-user job %s: %d users in %d chunks.", job.id, count, len(job.chunks))
+        return job
+
+    def get(self, job_id: str) -> Optional[DummyUserJob]:
+        return self._jobs.get(job_id)
+
+    def retry(self, job_id: str) -> Optional[DummyUserJob]:
+        """Re-runs only the failed chunks and failed insert batches of a finished job."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in ("queued", "running"):
+            return job
+        failed_chunks = [chunk for chunk in job.chunks if chunk.status == "failed"]
+        for chunk in failed_chunks:
+            chunk.status, chunk.attempts, chunk.error = "pending", 0, None
+        job.pending_rows.extend(job.failed_rows)
+        job.failed_rows = []
+        job.status = "queued"  # Until _run starts, so the 202 response does not report the previous outcome.
+        self._tasks[job.id] = asyncio.ensure_future(self._run(job, failed_chunks))
+        logger.info("Retrying dummy-user job %s: %d failed chunks.", job.id, len(failed_chunks))
+        return job
+
+    async def _run(self, job: DummyUserJob, chunks: List[ChunkState]) -> None:
+        job.status = "running"
+        job.finished_at = None
+        semaphore = asyncio.Semaphore(self.max_parallel_chunks)
+
+        async def run_chunk(chunk: ChunkState):
+            async with semaphore:
+                await self._run_chunk(job, chunk)
+
+        try:
+            # One chunk crashing must not cancel (or orphan) the others mid-flight.
+            results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks), return_exceptions=True)
+            for chunk, result in zip(chunks, results):
+                if isinstance(result, Exception):
+                    chunk.error = str(result)
+                    logger.error("Dummy-user job %s chunk %d crashed: %s", job.id, chunk.index, result, exc_info=result)
+        finally:
+            # Also on failure or cancellation: rows already generated are still inserted, and unfinished chunks
+            # are marked failed so retry() picks them up.
+            for chunk in chunks:
+                if chunk.status != "done":
+                    chunk.status = "failed"
+            try:
+                await self._flush(job, final=True)
+            except Exception as e:
+                logger.error("Dummy-user job %s final insert crashed: %s", job.id, e, exc_info=True)
+            failed = any(chunk.status != "done" for chunk in job.chunks) or job.failed_rows
+            job.status = "completed_with_errors" if failed else "completed"
+            job.finished_at = datetime.now(timezone.utc).isoformat()
+            self._tasks.pop(job.id, None)
+            logger.info("Dummy-user job %s %s: %d/%d inserted.", job.id, job.status, job.inserted, job.count)
+
+    async def shutdown(self) -> None:
+        """Cancels running jobs and waits for them to flush what they already generated."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_chunk(self, job: DummyUserJob, chunk: ChunkState) -> None:
+        chunk.status = "running"
+        while chunk.attempts < self.max_chunk_attempts:
+            chunk.attempts += 1
+            try:
+                raw = await self.generate(build_dummy_users_prompt(chunk.size), max_new_tokens=chunk.size * 1000,
+                                          response_schema=USER_PROFILE_SCHEMA)
+                if not raw:
+                    raise ValueError("AI did not return any generated JSON")
+                with timed("json_parse"):
+                    raw_profiles, complete = parse_llm_json(raw)
+                    if not isinstance(raw_profiles, list):
+                        raise ValueError("AI returned malformed data (not a list)")
+                    rows = postprocess_dummy_profiles(raw_profiles)
+                if not complete:
+                    # Truncated output: keep the completed profiles; the chunk just comes up short.
+                    if not rows:
+                        raise ValueError("AI output was truncated before the first complete profile")
+                    logger.warning("Job %s chunk %d: salvaged %d of %d profiles from truncated output.",
+                                   job.id, chunk.index, len(rows), chunk.size)
+            except LLMThrottledError as e:
+                # Bulk work is shed first while Gemini is throttled; wait as long as the scheduler asks.
+                chunk.error = str(e)
+                logger.warning("Job %s chunk %d throttled; retrying in %ss.", job.id, chunk.index, e.retry_after)
+                if chunk.attempts < self.max_chunk_attempts:
+                    await asyncio.sleep(e.retry_after)
+                continue
+            except ValueError as e: # Includes JSONDecodeError
+                chunk.error = str(e)
+                logger.warning("Job %s chunk %d attempt %d failed: %s", job.id, chunk.index, chunk.attempts, e)
+                if chunk.attempts < self.max_chunk_attempts:
+                    await asyncio.sleep(self._backoff(chunk.attempts))
+                continue
+
+            self._dedupe_emails(job, rows)
+            chunk.generated = len(rows)
+            chunk.status, chunk.error = "done", None
+            job.generated += len(rows)
+            job.pending_rows.extend(rows)
+            await self._flush(job)
+            return
+        chunk.status = "failed"
+
+    def _dedupe_emails(self, job: DummyUserJob, rows: List[Dict[str, Any]]) -> None:
+        # Gemini repeats plausible emails across independent chunks; rewrite repeats instead of dropping rows.
+        for row in rows:
+            email = str(row.get("email", "")).lower()
+            if email in job.seen_emails:
+                local, _, domain = email.partition("@")
+                email = f"{local}+{uuid.uuid4().hex[:8]}@{domain or 'example.com'}"
+                row["email"] = email
+                job.duplicate_emails += 1
+            job.seen_emails.add(email)
+
+    async def _flush(self, job: DummyUserJob, final: bool = False) -> None:
+        async with job.insert_lock:
+            while len(job.pending_rows) >= self.insert_batch_size or (final and job.pending_rows):
+                batch = job.pending_rows[:self.insert_batch_size]
+                del job.pending_rows[:self.insert_batch_size]
+                await self._upsert_batch(job, batch)
+
+    async def _upsert_batch(self, job: DummyUserJob, batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(1, self.max_insert_attempts + 1):
+            try:
+                # Rows carry their own UUID primary key, so re-sending a batch after a partial failure is idempotent.
+                await asyncio.to_thread(self.upsert_rows, batch)
+            except Exception as e:
+                logger.warning("Job %s upsert of %d rows failed (attempt %d/%d): %s", job.id, len(batch), attempt, self.max_insert_attempts, e)
+                if attempt < self.max_insert_attempts:
+                    await asyncio.sleep(self._backoff(attempt))
+                continue
+            job.inserted += len(batch)
+            if self.on_rows_inserted is not None:
+                self.on_rows_inserted(batch)
+            return
+        job.failed_rows.extend(batch)
+
+    def _backoff(self, attempt: int) -> float:
+        return self.retry_base_delay * (2 ** (attempt - 1)) * (0.5 + random.random())
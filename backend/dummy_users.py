@@ -0,0 +1,116 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from llm_json import compile_schema
+
+# Define the JSON schema for the AI to follow, matching your Supabase table
+# IMPORTANT: Use snake_case for keys to match your Supabase table columns
+# Removed 'name' from the schema and required fields
+USER_PROFILE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            # "name": {"type": "STRING", "description": "Realistic first name"}, # REMOVED
+            "email": {"type": "STRING", "description": "Unique dummy email address"},
+            "display_name": {"type": "STRING", "description": "A display name, often same as name"},
+            "bio": {"type": "STRING", "description": "A short, engaging bio (2-3 sentences)"},
+            "looking_for": {"type": "STRING", "description": "What they are looking for (e.g., 'long-term relationship', 'casual dating', 'friendship')"},
+            "profile_picture_url": {"type": "STRING", "description": "Placeholder URL like 'https://placehold.co/150x150/000000/FFFFFF?text=User+ID'"},
+            "date_of_birth": {"type": "STRING", "format": "date-time", "description": "Date of birth in YYYY-MM-DD format, for ages 20-40"},
+            "phone_number": {"type": "STRING", "description": "Dummy phone number (e.g., '+1-555-123-4567')"},
+            "location_zip_code": {"type": "STRING", "description": "Dummy 5-digit US zip code"},
+            "sexual_orientation": {"type": "STRING", "enum": ["Straight", "Gay", "Lesbian", "Bisexual", "Pansexual", "Queer", "Asexual", "Demisexual", "Other"]},
+            "height_cm": {"type": "NUMBER", "description": "Height in centimeters (e.g., 175.5)"},
+            "agreed_to_terms": {"type": "BOOLEAN", "description": "Always true for dummy data"},
+            "agreed_to_community_guidelines": {"type": "BOOLEAN", "description": "Always true for dummy data"},
+            "full_legal_name": {"type": "STRING", "description": "Dummy full legal name"},
+            "gender_identity": {"type": "STRING", "enum": ["Male", "Female", "Non-binary", "Transgender", "Genderfluid", "Agender", "Other"]},
+            "ethnicity": {"type": "STRING", "description": "Ethnicity (e.g., 'Caucasian', 'African American', 'Asian', 'Hispanic', 'Mixed')"},
+            "languages_spoken": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of languages spoken"},
+            "desired_occupation": {"type": "STRING", "description": "Dummy occupation"},
+            "education_level": {"type": "STRING", "enum": ["High School", "Some College", "Associate's Degree", "Bachelor's Degree", "Master's Degree", "Doctorate"]},
+            "hobbies_and_interests": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of 3-5 diverse hobbies and interests"},
+            "love_languages": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of love languages (e.g., 'Words of Affirmation', 'Quality Time')"},
+            "favorite_media": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of favorite movies, books, music genres"},
+            "marital_status": {"type": "STRING", "enum": ["Single", "Divorced", "Widowed", "Separated"]},
+            "has_children": {"type": "BOOLEAN"},
+            "wants_children": {"type": "BOOLEAN"},
+            "relationship_goals": {"type": "STRING", "description": "Goals for a relationship (e.g., 'serious relationship', 'casual fun')"},
+            "dealbreakers": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of dealbreakers"},
+            "religion_or_spiritual_beliefs": {"type": "STRING", "description": "Religious/spiritual beliefs"},
+            "political_views": {"type": "STRING", "description": "Political views"},
+            "diet": {"type": "STRING", "description": "Dietary preferences (e.g., 'Vegetarian', 'Vegan', 'Omnivore')"},
+            "smoking_habits": {"type": "STRING", "enum": ["Never", "Socially", "Regularly", "Trying to quit"]},
+            "drinking_habits": {"type": "STRING", "enum": ["Never", "Socially", "Occasionally", "Frequently"]},
+            "exercise_frequency_or_fitness_level": {"type": "STRING", "description": "Exercise habits or fitness level"},
+            "sleep_schedule": {"type": "STRING", "description": "Sleep schedule (e.g., 'Early bird', 'Night owl', 'Flexible')"},
+            "personality_traits": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "List of 3-5 personality traits"},
+            "willing_to_relocate": {"type": "BOOLEAN"},
+            "monogamy_vs_polyamory_preferences": {"type": "STRING", "enum": ["Monogamous", "Polyamorous", "Open to either"]},
+            "astrological_sign": {"type": "STRING", "description": "Astrological sign"},
+            "attachment_style": {"type": "STRING", "enum": ["Secure", "Anxious-Preoccupied", "Dismissive-Avoidant", "Fearful-Avoidant"]},
+            "communication_style": {"type": "STRING", "description": "Communication style (e.g., 'Direct', 'Passive', 'Thoughtful')"},
+            "mental_health_disclosures": {"type": "STRING", "description": "Brief, general mental health disclosure (e.g., 'Open about anxiety', 'Private')"},
+            "pet_ownership": {"type": "STRING", "description": "Pet ownership status (e.g., 'Has a dog', 'Loves cats but no pets')"},
+            "travel_frequency_or_favorite_destinations": {"type": "STRING", "description": "Travel habits or dream destinations"},
+            # Changed to STRING, AI will return JSON string, then Python parses
+            "profile_visibility_preferences": {"type": "STRING", "description": "JSON string of visibility preferences, e.g., '{\"email_visible\": true, \"phone_visible\": false}'"},
+            "push_notification_preferences": {"type": "STRING", "description": "JSON string of notification preferences, e.g., '{\"new_match\": true, \"message_received\": false}'"},
+            "is_phase_1_complete": {"type": "BOOLEAN", "description": "Always true for dummy data"},
+            "is_phase_2_complete": {"type": "BOOLEAN", "description": "Always true for dummy data"},
+            "questionnaire_answers": {"type": "STRING", "description": "JSON string of dummy answers to a few questionnaire questions, e.g., '{\"q1\": \"answer text\", \"q2\": \"another answer\"}'"},
+            "personality_assessment_results": {"type": "STRING", "description": "JSON string of dummy personality assessment scores (e.g., '{\"openness\": 0.7, \"conscientiousness\": 0.8}')"},
+        },
+        "required": ["email", "display_name", "bio", "profile_picture_url", "date_of_birth", "gender_identity", "hobbies_and_interests"] # REMOVED 'name'
+    }
+}
+
+# Columns the AI returns as JSON strings; they are parsed back into objects for Supabase's jsonb columns
+JSON_STRING_FIELDS = [
+    "profile_visibility_preferences",
+    "push_notification_preferences",
+    "questionnaire_answers",
+    "personality_assessment_results"
+]
+
+def build_dummy_users_prompt(count: int) -> str:
+    return f"""Generate {count} diverse and realistic user profiles for a dating application.
+    Each profile should strictly adhere to the provided JSON schema.
+    Ensure 'id' and 'email' are unique for each profile.
+    For 'id', generate a valid UUID.
+    For 'email', generate a unique dummy email (e.g., 'user_name_123@example.com').
+    'created_at' and 'updated_at' should be current UTC timestamps in ISO 8601 format.
+    'agreed_to_terms', 'agreed_to_community_guidelines', 'is_phase_1_complete', 'is_phase_2_complete' should be true.
+    For array fields (e.g., hobbies_and_interests, languages_spoken), provide a list of strings.
+    For object fields (e.g., profile_visibility_preferences, questionnaire_answers), provide a JSON string.
+    Ensure all string fields have meaningful, varied content.
+    """
+
+# Compiled once: key projection, type/enum coercion, JSON-string decoding and defaults for every row.
+DUMMY_PROFILE_SCHEMA = compile_schema(
+    USER_PROFILE_SCHEMA,
+    json_string_fields=JSON_STRING_FIELDS,
+    defaults={
+        "email": lambda profile: f"dummy_user_{uuid.uuid4().hex[:8]}@example.com",
+        "agreed_to_terms": True,
+        "agreed_to_community_guidelines": True,
+        "is_phase_1_complete": True,
+        "is_phase_2_complete": True,
+    },
+)
+
+def postprocess_dummy_profiles(raw_profiles: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Turns AI-generated profiles into rows for the user_profiles table: drops keys that are not in the
+    schema, coerces values to their schema types, decodes JSON-string fields, fills missing emails and
+    adds id and timestamps (one timestamp for the whole batch).
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    rows = DUMMY_PROFILE_SCHEMA.normalize_many(raw_profiles)
+    for row in rows:
+        row['id'] = str(uuid.uuid4())
+        row['created_at'] = now
+        row['updated_at'] = now
+    return rows
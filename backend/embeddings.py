@@ -0,0 +1,427 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Matches the match-users Supabase function (text-embedding-004, 768 dimensions).
+DEFAULT_EMBEDDING_MODEL = "models/text-embedding-004"
+DEFAULT_EMBEDDING_DIM = 768
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def profile_embedding_text(profile: Dict[str, Any]) -> str:
+    """The text embedded for a profile: its bio followed by its questionnaire answers."""
+    parts = [str(profile.get("bio") or "").strip()]
+    answers = profile.get("questionnaire_answers")
+    if isinstance(answers, str):
+        try:
+            answers = json.loads(answers)
+        except json.JSONDecodeError:
+            parts.append(answers.strip())
+            answers = None
+    if isinstance(answers, dict):
+        parts.extend(f"{question}: {answer}" for question, answer in sorted(answers.items()) if answer)
+    return "\n".join(part for part in parts if part)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+# --- Embedding Providers ---
+
+class GeminiEmbeddingProvider:
+    """Embeds text with Gemini's embedding model. genai must already be configured with an API key."""
+
+    def __init__(self, model: str = DEFAULT_EMBEDDING_MODEL, dim: int = DEFAULT_EMBEDDING_DIM,
+                 task_type: str = "retrieval_document", query_task_type: str = "retrieval_query"):
+        self.model = model
+        self.dim = dim
+        self.task_type = task_type
+        self.query_task_type = query_task_type
+        self.name = f"gemini:{model}:{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._embed(texts, self.task_type)
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embeds search queries, which the model encodes differently from the documents they are matched against."""
+        return self._embed(texts, self.query_task_type)
+
+    def _embed(self, texts: List[str], task_type: str) -> np.ndarray:
+        import google.generativeai as genai
+
+        result = genai.embed_content(model=self.model, content=texts, task_type=task_type,
+                                     output_dimensionality=self.dim)
+        return np.asarray(result["embedding"], dtype=np.float32).reshape(len(texts), self.dim)
+
+
+class HashingEmbeddingProvider:
+    """
+    Deterministic local stand-in for tests and offline development: hashes word unigrams and bigrams
+    into signed buckets. Texts sharing words get similar vectors, and no network call is made.
+    """
+
+    def __init__(self, dim: int = DEFAULT_EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vectors
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self.embed(texts)
+
+
+# --- Approximate Index ---
+
+class IVFIndex:
+    """
+    Inverted-file approximate index: vectors are clustered with k-means and a query only scans the
+    `nprobe` clusters whose centroids are closest to it. Built over a snapshot of the store; rows added
+    afterwards are searched exactly by EmbeddingStore until the index is rebuilt.
+    """
+
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray, nlist: Optional[int] = None,
+                 iterations: int = 8, sample_size: int = 50000, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        nlist = nlist or max(1, int(np.sqrt(len(rows))))
+        sample = rows if len(rows) <= sample_size else rng.choice(rows, sample_size, replace=False)
+        centroids = vectors[rng.choice(sample, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors[sample] @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = vectors[members].mean(axis=0)
+            centroids = _normalize_rows(centroids)
+
+        self.centroids = centroids
+        self.built_rows = len(rows)
+        # Rows at or beyond this index were appended after the build and are not in any list.
+        self.row_limit = int(rows.max()) + 1
+        assignment = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), 65536):
+            block = rows[start:start + 65536]
+            assignment[start:start + 65536] = np.argmax(vectors[block] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        self._rows = rows[order]
+        self._offsets = np.searchsorted(assignment[order], np.arange(nlist + 1))
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._rows[self._offsets[c]:self._offsets[c + 1]] for c in probes])
+
+
+# --- Store ---
+
+class EmbeddingStore:
+    """
+    Persistent profile-embedding store backed by a memory-mapped float32 matrix.
+
+    Files: `<path>.f32` holds one L2-normalized row per profile, and `<path>.index.json` maps rows to profile
+    ids and the hash of the text they were embedded from, so unchanged text is never re-embedded. Changes
+    are appended to `<path>.index.log` (one JSON line per row) and folded into a new snapshot, written
+    atomically, once the log has more entries than half the rows: an update costs O(rows changed)
+    amortized, not O(N).
+    Search is an exact blocked matrix product; once the store holds `ann_threshold` vectors, searches with
+    approximate=True go through an IVFIndex instead. The index is built on a background thread (at open,
+    or when the current one is missing or stale); until it is ready, searches stay exact.
+    """
+
+    def __init__(self, path: str, provider: Any, ann_threshold: int = 50000, block_rows: int = 65536,
+                 embed_batch_size: int = 100, compact_min_entries: int = 1024):
+        self.path = path
+        self.provider = provider
+        self.dim = provider.dim
+        self.ann_threshold = ann_threshold
+        self.block_rows = block_rows
+        self.embed_batch_size = embed_batch_size
+        self.compact_min_entries = compact_min_entries
+        self._lock = threading.RLock()
+        self._ids: List[Optional[str]] = []
+        self._hashes: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._ann: Optional[IVFIndex] = None
+        self._ann_building = False
+        # Bumped whenever a row inside the indexed range is reused, so a build that started earlier is discarded.
+        self._ann_generation = 0
+        self._log_entries = 0
+        self._load()
+        if len(self) and len(self) >= self.ann_threshold:
+            self._schedule_ann_build()
+
+    @property
+    def _vectors_path(self) -> str:
+        return f"{self.path}.f32"
+
+    @property
+    def _index_path(self) -> str:
+        return f"{self.path}.index.json"
+
+    @property
+    def _log_path(self) -> str:
+        return f"{self.path}.index.log"
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _load(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self._index_path):
+            self._resize(1024)
+            self._save_index()  # Records the provider, which the change log does not repeat.
+            return
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index["provider"] != self.provider.name or index["dim"] != self.dim:
+            raise ValueError(f"Embedding store at {self.path} was built with {index['provider']} ({index['dim']} dims), "
+                             f"not {self.provider.name}; use a different EMBEDDING_STORE_PATH.")
+        self._ids, self._hashes = index["ids"], index["hashes"]
+        self._replay_log()
+        self._row_of = {profile_id: row for row, profile_id in enumerate(self._ids) if profile_id is not None}
+        self._free_rows = [row for row, profile_id in enumerate(self._ids) if profile_id is None]
+        self._capacity = os.path.getsize(self._vectors_path) // (4 * self.dim)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim))
+        logger.info("Loaded embedding store %s with %d vectors.", self.path, len(self))
+
+    def _resize(self, capacity: int) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+        # Growing the file in place keeps existing rows; the memmap is then reopened at the new size.
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _replay_log(self) -> None:
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A write torn by a crash; everything before it is intact.
+                row = entry["row"]
+                while len(self._ids) <= row:
+                    self._ids.append(None)
+                    self._hashes.append(None)
+                self._ids[row], self._hashes[row] = entry["id"], entry["hash"]
+                self._log_entries += 1
+
+    def _save_index(self) -> None:
+        """Writes a full snapshot (to a temporary file, then os.replace) and empties the change log."""
+        self._vectors.flush()
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"provider": self.provider.name, "dim": self.dim, "ids": self._ids, "hashes": self._hashes}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._index_path)
+        # Replaying log entries over the new snapshot is harmless, so a crash before this line loses nothing.
+        open(self._log_path, "w").close()
+        self._log_entries = 0
+
+    def _append_log(self, rows: Iterable[int]) -> None:
+        # Vectors first: a logged row must never point at a vector that is not on disk yet.
+        self._vectors.flush()
+        lines = [json.dumps({"row": row, "id": self._ids[row], "hash": self._hashes[row]}) + "\n" for row in rows]
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+        self._log_entries += len(lines)
+        if self._log_entries > max(self.compact_min_entries, len(self._ids) // 2):
+            self._save_index()
+
+    def _allocate_row(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+        row = len(self._ids)
+        if row >= self._capacity:
+            self._resize(self._capacity * 2)
+        self._ids.append(None)
+        self._hashes.append(None)
+        return row
+
+    def upsert_texts(self, texts: Dict[str, str]) -> Dict[str, int]:
+        """Embeds and stores {profile_id: text}, skipping ids whose text hash is unchanged."""
+        with self._lock:
+            stale = [(str(profile_id), text, content_hash(text)) for profile_id, text in texts.items() if text]
+            stale = [item for item in stale if self._hash_of(item[0]) != item[2]]
+        for start in range(0, len(stale), self.embed_batch_size):
+            batch = stale[start:start + self.embed_batch_size]
+            vectors = self.provider.embed([text for _, text, _ in batch])
+            self.upsert_vectors([profile_id for profile_id, _, _ in batch], [h for _, _, h in batch], vectors)
+        return {"embedded": len(stale), "skipped": len(texts) - len(stale)}
+
+    def upsert_vectors(self, ids: List[str], hashes: List[Optional[str]], vectors: np.ndarray) -> None:
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            rows = []
+            for profile_id, text_hash, vector in zip(ids, hashes, vectors):
+                row = self._row_of.get(profile_id)
+                if row is None:
+                    row = self._allocate_row()
+                    self._row_of[profile_id] = row
+                    self._ids[row] = profile_id
+                    if row < len(self._ids) - 1:
+                        # A recycled row inside the indexed range would be invisible to the IVF lists.
+                        self._ann_generation += 1
+                        if self._ann is not None and row < self._ann.row_limit:
+                            self._ann = None
+                self._hashes[row] = text_hash
+                self._vectors[row] = vector
+                rows.append(row)
+            self._append_log(rows)
+
+    def remove(self, profile_id: str) -> bool:
+        return self.remove_many([profile_id]) == 1
+
+    def remove_many(self, profile_ids: Iterable[str]) -> int:
+        """Removes the given profiles with one log write; returns how many were stored."""
+        with self._lock:
+            rows = []
+            for profile_id in profile_ids:
+                row = self._row_of.pop(profile_id, None)
+                if row is None:
+                    continue
+                self._ids[row] = None
+                self._hashes[row] = None
+                self._vectors[row] = 0.0
+                # Freed rows are excluded from every search, so the IVF index stays valid until one is reused.
+                self._free_rows.append(row)
+                rows.append(row)
+            if rows:
+                self._append_log(rows)
+            return len(rows)
+
+    def _hash_of(self, profile_id: str) -> Optional[str]:
+        row = self._row_of.get(profile_id)
+        return None if row is None else self._hashes[row]
+
+    def vector_of(self, profile_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._row_of.get(profile_id)
+            return None if row is None else np.array(self._vectors[row])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return _normalize_rows(self.provider.embed_queries([text]))[0]
+
+    def build_ann_index(self, nlist: Optional[int] = None) -> None:
+        with self._lock:
+            rows = np.array(sorted(self._row_of.values()), dtype=np.int64)
+            vectors = self._vectors
+            generation = self._ann_generation
+        if len(rows) == 0:
+            return
+        index = IVFIndex(vectors, rows, nlist=nlist)
+        with self._lock:
+            if generation != self._ann_generation:
+                logger.info("Discarding IVF index over %d vectors: rows were reused while it was built.", len(rows))
+                return
+            self._ann = index
+        logger.info("Built IVF index over %d vectors with %d lists.", len(rows), len(index.centroids))
+
+    def _schedule_ann_build(self) -> None:
+        with self._lock:
+            if self._ann_building:
+                return
+            self._ann_building = True
+        threading.Thread(target=self._build_ann_in_background, name="embedding-ann-build", daemon=True).start()
+
+    def _build_ann_in_background(self) -> None:
+        try:
+            self.build_ann_index()
+        except Exception as e:
+            logger.error("Building the IVF index failed: %s", e, exc_info=True)
+        finally:
+            with self._lock:
+                self._ann_building = False
+
+    def search(self, query: np.ndarray, k: int = 10, exclude_ids: Iterable[str] = (),
+               approximate: bool = False, nprobe: int = 8) -> List[Tuple[str, float]]:
+        """Top-k (profile_id, cosine similarity) pairs for one query vector."""
+        return self.search_many(np.asarray(query, dtype=np.float32)[None, :], k, exclude_ids, approximate, nprobe)[0]
+
+    def search_many(self, queries: np.ndarray, k: int = 10, exclude_ids: Iterable[str] = (),
+                    approximate: bool = False, nprobe: int = 8) -> List[List[Tuple[str, float]]]:
+        queries = _normalize_rows(np.atleast_2d(queries))
+        with self._lock:
+            n = len(self._ids)
+            vectors = self._vectors
+            excluded = {self._row_of[p] for p in exclude_ids if p in self._row_of} | set(self._free_rows)
+            use_ann = approximate and n >= self.ann_threshold
+            ann = self._ann
+        if use_ann and (ann is None or ann.built_rows < 0.8 * len(self._row_of)):
+            # Never built inside a request: a stale index keeps serving, a missing one means exact search.
+            self._schedule_ann_build()
+
+        fetch = k + len(excluded)
+        results = []
+        if ann is not None and use_ann:
+            for query in queries:
+                # Rows appended after the index was built are not in any list yet, so scan them exactly.
+                rows = np.concatenate([ann.candidates(query, nprobe), np.arange(ann.row_limit, n)])
+                results.append(self._top_rows(rows, vectors[rows] @ query, fetch))
+        else:
+            # Exact search: one matrix product per block of rows, keeping a running top-k per query.
+            best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+            best_scores = [np.empty(0, dtype=np.float32) for _ in queries]
+            for start in range(0, n, self.block_rows):
+                block_scores = vectors[start:min(n, start + self.block_rows)] @ queries.T
+                for q in range(len(queries)):
+                    rows = np.concatenate([best_rows[q], np.arange(start, start + len(block_scores))])
+                    scores = np.concatenate([best_scores[q], block_scores[:, q]])
+                    if len(scores) > fetch:
+                        keep = np.argpartition(-scores, fetch - 1)[:fetch]
+                        rows, scores = rows[keep], scores[keep]
+                    best_rows[q], best_scores[q] = rows, scores
+            results = [self._top_rows(rows, scores, fetch) for rows, scores in zip(best_rows, best_scores)]
+
+        with self._lock:
+            return [[(self._ids[row], round(float(score), 6)) for row, score in result
+                     if row not in excluded and self._ids[row] is not None][:k] for result in results]
+
+    @staticmethod
+    def _top_rows(rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return list(zip(rows[order].tolist(), scores[order].tolist()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "vectors": len(self),
+            "capacity": self._capacity,
+            "dim": self.dim,
+            "provider": self.provider.name,
+            "ann_index_rows": self._ann.built_rows if self._ann is not None else 0,
+            "ann_index_building": self._ann_building,
+            "index_log_entries": self._log_entries,
+        }
@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ("variants", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.variants: List[str] = []
+        self.expires_at = expires_at
+
+
+class LLMResponseCache:
+    """
+    In-process cache for LLM responses with TTL expiry, LRU eviction and single-flight deduplication.
+
+    Each key can hold a pool of up to `variants` distinct responses: until the pool is full every
+    request generates (and stores) a fresh response, after that a random pooled one is served.
+    Concurrent misses for the same key share one in-flight generation.
+
+    Expired entries stay in place until LRU eviction, so when generation fails with one of
+    `stale_exceptions` (e.g. the LLM is throttled) the last good response is served instead.
+
+    With a `shared` store (shared_state.SharedStateStore) every stored response is also written there,
+    and a key whose local pool is not full is looked up there before generating, so workers on the same
+    host fill and serve one pool per key. Shared reads and writes run on a small thread pool of their own,
+    never on the event loop; a lookup that fails (e.g. the store is busy) counts as a miss.
+    Single-flight deduplication stays per process.
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 3600.0,
+                 stale_exceptions: Tuple[Type[BaseException], ...] = (), shared: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_exceptions = stale_exceptions
+        self.shared = shared
+        self._shared_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="shared-cache") if shared is not None else None
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale_served = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    @staticmethod
+    def make_key(prompt_text: str, **generation_config: Any) -> str:
+        """Builds a cache key from the whitespace-normalized prompt and the generation config."""
+        normalized_prompt = re.sub(r"\s+", " ", prompt_text).strip()
+        payload = json.dumps({"prompt": normalized_prompt, "config": generation_config}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns a cached response for `key` if one is present and fresh, otherwise None."""
+        entry = self._entries.get(key)
+        if entry is None or not entry.variants or entry.expires_at <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        return random.choice(entry.variants)
+
+    def get_stale(self, key: str) -> Optional[str]:
+        """Returns a cached response for `key` even if it has expired."""
+        entry = self._entries.get(key)
+        return random.choice(entry.variants) if entry is not None and entry.variants else None
+
+    async def _load_shared(self, key: str, fresh_only: bool = True) -> Optional[_CacheEntry]:
+        """Copies the key's pool from the shared store into this process; None if it has none (or only an expired one)."""
+        try:
+            found = await asyncio.get_running_loop().run_in_executor(self._shared_executor, self.shared.cache_get, key)
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning("Shared LLM cache lookup failed: %s", e)
+            return None
+        if found is None:
+            return None
+        variants, expires_at = found
+        remaining = expires_at - time.time()
+        if not variants or (fresh_only and remaining <= 0):
+            return None
+        # Shared expiry is wall-clock; local entries use the monotonic clock.
+        entry = _CacheEntry(time.monotonic() + remaining)
+        entry.variants = variants
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def put(self, key: str, value: str, ttl: Optional[float] = None, variants: int = 1) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        if self.shared is not None:
+            write = self._shared_executor.submit(self.shared.cache_put, key, value, ttl, variants, self.max_entries)
+            write.add_done_callback(self._on_shared_write)
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            # A fresh response replaces the expired pool rather than being mixed into it.
+            entry = _CacheEntry(time.monotonic() + ttl)
+            self._entries[key] = entry
+        if value not in entry.variants:
+            entry.variants.append(value)
+            del entry.variants[:-variants]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[Optional[str]]],
+                              ttl: Optional[float] = None, variants: int = 1,
+                              disconnected: Optional[Callable[[], Awaitable[Any]]] = None) -> Optional[str]:
+        """
+        Returns a cached response for `key`, or awaits `generate()` and caches its result.
+        Failed generations (None) are never cached.
+
+        `generate` is shared by every caller that joins it, so it must not depend on any one caller's
+        connection. Instead each caller may pass `disconnected`, which completes when that caller is gone:
+        the caller then stops waiting (and gets None) while the generation continues for the others.
+        """
+        entry = self._entries.get(key)
+        pool_full = entry is not None and len(entry.variants) >= variants
+        if pool_full:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+        if self.shared is not None and key not in self._in_flight:
+            # Another worker may already have filled the pool.
+            entry = await self._load_shared(key)
+            if entry is not None and len(entry.variants) >= variants:
+                self.shared_hits += 1
+                return random.choice(entry.variants)
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug("Joining in-flight LLM generation for cache key %s", key[:12])
+        else:
+            self.misses += 1
+            # The generation runs as its own task so a cancelled caller does not cancel it for everyone else.
+            task = asyncio.ensure_future(generate())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._on_generated(key, t, ttl, variants))
+
+        try:
+            if disconnected is None:
+                return await asyncio.shield(task)
+            return await self._wait_unless_disconnected(key, task, disconnected)
+        except self.stale_exceptions:
+            stale = self.get_stale(key)
+            if stale is None and self.shared is not None:
+                entry = await self._load_shared(key, fresh_only=False)
+                stale = random.choice(entry.variants) if entry is not None else None
+            if stale is None:
+                raise
+            self.stale_served += 1
+            logger.info("Serving last good response for cache key %s while the LLM is unavailable.", key[:12])
+            return stale
+
+    async def _wait_unless_disconnected(self, key: str, task: asyncio.Task,
+                                        disconnected: Callable[[], Awaitable[Any]]) -> Optional[str]:
+        # asyncio.wait never cancels `task`, so leaving early does not affect the other callers.
+        watcher = asyncio.ensure_future(disconnected())
+        try:
+            done, _ = await asyncio.wait([task, watcher], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+        if task in done:
+            return task.result()
+        logger.info("Client disconnected; no longer waiting for cache key %s.", key[:12])
+        return None
+
+    def _on_shared_write(self, write: Future) -> None:
+        # Runs on the writer thread. A lost write only costs other workers one extra generation.
+        if not write.cancelled() and write.exception() is not None:
+            self.shared_errors += 1
+            logger.warning("Shared LLM cache write failed: %s", write.exception())
+
+    def _on_generated(self, key: str, task: asyncio.Task, ttl: Optional[float], variants: int) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if result is not None:
+            self.put(key, result, ttl=ttl, variants=variants)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        if self.shared is not None:
+            self.shared.cache_clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "stale_served": self.stale_served,
+            "hit_rate": (self.hits + self.shared_hits + self.coalesced) / lookups if lookups else 0.0,
+            "in_flight": len(self._in_flight),
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors,
+        }
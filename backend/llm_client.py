@@ -0,0 +1,258 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from fastapi import Request
+
+from llm_scheduler import LLMQuotaExceededError, LLMScheduler, LLMThrottledError, Priority, estimate_tokens
+from observability import count, record_phase
+
+logger = logging.getLogger(__name__)
+
+# Sentinel the stream producer thread enqueues once the underlying iterator is exhausted.
+_STREAM_END = object()
+
+
+class LLMClient:
+    """
+    Async front-end for a blocking LLM call.
+
+    The wrapped function (e.g. generate_text_with_llm) runs on a dedicated thread pool so a slow
+    Gemini round-trip never blocks the event loop. At most `max_concurrency` calls are in flight;
+    extra callers wait on a semaphore. Each call is bounded by `timeout` seconds and is abandoned
+    as soon as the HTTP client disconnects.
+
+    `stream_fn`, if given, is a blocking generator of text chunks (e.g. stream_text_with_llm) used by
+    stream(); it shares the same thread pool and concurrency limit.
+
+    With a `scheduler`, every call first waits for quota admission at its priority. A call that fails with
+    LLMQuotaExceededError is reported to the scheduler (which backs off) and retried up to
+    `max_quota_retries` times before LLMThrottledError is raised to the caller.
+    """
+
+    def __init__(self, generate_fn: Callable[..., Optional[str]], max_concurrency: int = 8,
+                 timeout: Optional[float] = 30.0, disconnect_poll_interval: float = 0.5,
+                 stream_fn: Optional[Callable[..., Iterator[str]]] = None,
+                 scheduler: Optional[LLMScheduler] = None, max_quota_retries: int = 2):
+        self.generate_fn = generate_fn
+        self.stream_fn = stream_fn
+        self.scheduler = scheduler
+        self.max_quota_retries = max_quota_retries
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.disconnect_poll_interval = disconnect_poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop, not the import-time one.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def generate(self, prompt_text: str, http_request: Optional[Request] = None,
+                       timeout: Optional[float] = None, priority: Priority = Priority.INTERACTIVE,
+                       **kwargs: Any) -> Optional[str]:
+        """
+        Runs generate_fn(prompt_text, **kwargs) off the event loop.
+        Returns None on timeout or client disconnect, mirroring generate_text_with_llm's failure value.
+        Raises LLMThrottledError when the scheduler sheds the call or quota retries are exhausted.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(self.max_quota_retries + 1):
+            queued = time.perf_counter()
+            await self._admit(prompt_text, priority, timeout, kwargs)
+            record_phase("queue", time.perf_counter() - queued)
+            try:
+                result = await self._call(prompt_text, http_request, timeout, kwargs)
+            except LLMQuotaExceededError as e:
+                if self.scheduler is None:
+                    logger.warning("Gemini quota exceeded: %s", e)
+                    return None
+                delay = self.scheduler.record_quota_error()
+                if attempt == self.max_quota_retries:
+                    raise LLMThrottledError("Gemini quota exhausted", retry_after=round(max(1.0, delay), 1))
+                logger.warning("Gemini quota exceeded; retrying after backoff (attempt %d/%d).", attempt + 1, self.max_quota_retries)
+                continue
+            if self.scheduler is not None:
+                # None is a timeout, disconnect or API error: not evidence that Gemini has recovered.
+                if result is None:
+                    self.scheduler.record_failure()
+                else:
+                    self.scheduler.record_success()
+            return result
+
+    async def _admit(self, prompt_text: str, priority: Priority, timeout: Optional[float], kwargs: Dict[str, Any]) -> None:
+        if self.scheduler is None:
+            return
+        estimate = estimate_tokens(prompt_text, kwargs.get("max_new_tokens", 500))
+        try:
+            await asyncio.wait_for(self.scheduler.acquire(priority, estimate), timeout)
+        except asyncio.TimeoutError:
+            raise LLMThrottledError("Timed out waiting for Gemini quota", retry_after=round(timeout or 1.0, 1))
+
+    async def _call(self, prompt_text: str, http_request: Optional[Request], timeout: Optional[float],
+                    kwargs: Dict[str, Any]) -> Optional[str]:
+        semaphore = self._get_semaphore()
+        loop = asyncio.get_running_loop()
+
+        queued = time.perf_counter()
+        await semaphore.acquire()
+        started = time.perf_counter()
+        record_phase("queue", started - queued)
+        self.in_flight += 1
+
+        def _release(_):
+            # The worker thread cannot be interrupted, so the slot is only freed once it really finishes.
+            loop.call_soon_threadsafe(self._on_call_finished, semaphore)
+
+        try:
+            # Run in a copy of the caller's context so the worker thread logs and records under the same trace.
+            future = self._executor.submit(contextvars.copy_context().run, self.generate_fn, prompt_text, **kwargs)
+        except BaseException:
+            self._on_call_finished(semaphore)
+            raise
+        future.add_done_callback(_release)
+
+        call = asyncio.wrap_future(future)
+        waiters = [call]
+        watcher = None
+        if http_request is not None:
+            watcher = asyncio.ensure_future(self.wait_for_disconnect(http_request))
+            waiters.append(watcher)
+
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if call in done:
+                return call.result()
+            if watcher is not None and watcher in done:
+                logger.info("Client disconnected; abandoning LLM call.")
+                count("llm_errors_total", error="client_disconnect")
+            else:
+                logger.error("LLM call timed out after %ss.", timeout)
+                count("llm_errors_total", error="timeout")
+            future.cancel()
+            return None
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            record_phase("llm", time.perf_counter() - started)
+            if watcher is not None:
+                watcher.cancel()
+
+    async def stream(self, prompt_text: str, timeout: Optional[float] = None, priority: Priority = Priority.INTERACTIVE,
+                     **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Yields text chunks from stream_fn(prompt_text, **kwargs) as the worker thread produces them.
+        Stops after `timeout` seconds overall. Closing the generator (Starlette does this when the client
+        disconnects from a StreamingResponse) tells the worker thread to stop pulling chunks.
+        Raises LLMThrottledError, like generate(), when the call is shed or Gemini reports quota exhaustion.
+        """
+        if self.stream_fn is None:
+            raise RuntimeError("LLMClient was created without a stream_fn.")
+        timeout = self.timeout if timeout is None else timeout
+        semaphore = self._get_semaphore()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        quota_exceeded = threading.Event()
+        failed = threading.Event()
+        produced = threading.Event()
+
+        def _enqueue(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # Event loop already closed.
+
+        def _produce():
+            try:
+                for chunk in self.stream_fn(prompt_text, **kwargs):
+                    if stop.is_set():
+                        break
+                    produced.set()
+                    _enqueue(chunk)
+            except LLMQuotaExceededError:
+                quota_exceeded.set()
+            except Exception as e:
+                failed.set()
+                logger.debug("LLM stream ended early: %s", e)  # stream_fn has already logged the details
+            finally:
+                _enqueue(_STREAM_END)
+
+        queued = time.perf_counter()
+        await self._admit(prompt_text, priority, timeout, kwargs)
+        await semaphore.acquire()
+        started = time.perf_counter()
+        record_phase("queue", started - queued)
+        self.in_flight += 1
+        try:
+            future = self._executor.submit(contextvars.copy_context().run, _produce)
+        except BaseException:
+            self._on_call_finished(semaphore)
+            raise
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._on_call_finished, semaphore))
+
+        deadline = None if timeout is None else loop.time() + timeout
+        completed = False
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - loop.time()
+                if remaining is not None and remaining <= 0:
+                    logger.error("LLM stream timed out after %ss.", timeout)
+                    count("llm_errors_total", error="timeout")
+                    return
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    continue
+                if chunk is _STREAM_END:
+                    # An empty stream is a failure too: it is not evidence that Gemini has recovered.
+                    completed = produced.is_set() and not (quota_exceeded.is_set() or failed.is_set())
+                    break
+                yield chunk
+        finally:
+            stop.set()
+            future.cancel()
+            record_phase("llm", time.perf_counter() - started)
+            delay = None
+            if self.scheduler is not None:
+                if quota_exceeded.is_set():
+                    delay = self.scheduler.record_quota_error()
+                elif completed:
+                    self.scheduler.record_success()
+                else:
+                    self.scheduler.record_failure()
+            elif quota_exceeded.is_set():
+                logger.warning("Gemini quota exceeded; stream ended early.")
+        if delay is not None:
+            # Same contract as generate(): the caller turns this into a throttled response with Retry-After.
+            raise LLMThrottledError("Gemini quota exhausted", retry_after=round(max(1.0, delay), 1))
+
+    def _on_call_finished(self, semaphore: asyncio.Semaphore) -> None:
+        self.in_flight -= 1
+        semaphore.release()
+
+    async def wait_for_disconnect(self, http_request: Request) -> None:
+        """Completes once the HTTP client has gone away (polled every `disconnect_poll_interval` seconds)."""
+        while not await http_request.is_disconnected():
+            await asyncio.sleep(self.disconnect_poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "timeout_seconds": self.timeout,
+        }
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,407 @@
+"""
+JSON handling for LLM output and API responses.
+
+- loads()/dumps(): orjson when it is installed (optional dependency), the standard library otherwise.
+- FastJSONResponse: a JSONResponse rendered with dumps().
+- PartialJsonParser / parse_llm_json(): tolerant (and, for streams, incremental) parsing of truncated or
+  chatty output.
+- compile_schema(): turns a Gemini response schema into a reusable normalizer for the parsed objects.
+"""
+import json
+import logging
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: faster parsing and encoding, same results.
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is not None:
+    JSONDecodeError = orjson.JSONDecodeError  # Subclass of json.JSONDecodeError
+
+    def loads(text: Any) -> Any:
+        return orjson.loads(text)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+else:
+    JSONDecodeError = json.JSONDecodeError
+
+    def loads(text: Any) -> Any:
+        return json.loads(text)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    return dumps_bytes(obj).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+
+# --- Tolerant incremental parsing ---
+
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_WHITESPACE = " \t\r\n"
+_SEPARATORS = re.compile(r"[\s,]*")
+_decoder = json.JSONDecoder()
+
+
+class PartialJsonParser:
+    """
+    Incremental JSON parser that tolerates what LLMs produce: prose or a ```json fence before the
+    value, single-quoted strings, trailing commas and output cut off mid-value.
+
+    feed() returns the items of the top-level array completed by that chunk, so a streamed list can be
+    forwarded item by item. `value` is the best-effort result so far: open containers are closed and an
+    unfinished trailing string, number or key is dropped. Text after the top-level value is ignored.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._closed = False
+        self._root: Any = None
+        self._stack: List[Any] = []  # Open containers, innermost last
+        self._keys: List[Optional[str]] = []  # Per open object: key awaiting its value
+        self._quote: Optional[str] = None
+        self._is_key = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._buffer: List[str] = []
+        self._literal: List[str] = []
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def value(self) -> Any:
+        return self._root
+
+    def feed(self, chunk: str) -> List[Any]:
+        completed: List[Any] = []
+        for char in chunk:
+            if self._closed:
+                break
+            if not self._started:
+                if char in "[{":
+                    self._started = True
+                    self._open([] if char == "[" else {})
+                continue
+            if self._quote is not None:
+                self._string_char(char, completed)
+            elif self._literal and char not in ",]}:" and char not in _WHITESPACE:
+                self._literal.append(char)
+            else:
+                if self._literal:
+                    self._end_literal(completed)
+                self._structural(char, completed)
+        return completed
+
+    def _structural(self, char: str, completed: List[Any]) -> None:
+        if char in _WHITESPACE or char in ",:":
+            return
+        if char in "]}":
+            self._close(completed)
+        elif char in "[{":
+            self._open([] if char == "[" else {})
+        elif char in "\"'":
+            self._quote, self._buffer = char, []
+            self._is_key = isinstance(self._stack[-1], dict) and self._keys[-1] is None
+        else:
+            self._literal = [char]
+
+    def _string_char(self, char: str, completed: List[Any]) -> None:
+        if self._unicode is not None:
+            self._unicode += char
+            if len(self._unicode) == 4:
+                try:
+                    self._buffer.append(chr(int(self._unicode, 16)))
+                except ValueError:
+                    self._buffer.append(self._unicode)
+                self._unicode = None
+        elif self._escape:
+            self._escape = False
+            if char == "u":
+                self._unicode = ""
+            else:
+                self._buffer.append(_ESCAPES.get(char, char))
+        elif char == "\\":
+            self._escape = True
+        elif char == self._quote:
+            self._quote = None
+            text = "".join(self._buffer)
+            if self._is_key:
+                self._keys[-1] = text
+            else:
+                self._add(text, completed)
+        else:
+            self._buffer.append(char)
+
+    def _end_literal(self, completed: List[Any]) -> None:
+        text = "".join(self._literal)
+        self._literal = []
+        if text in _LITERALS:
+            value = _LITERALS[text]
+        else:
+            try:
+                value = json.loads(text)
+            except ValueError:
+                value = text
+        if isinstance(self._stack[-1], dict) and self._keys[-1] is None:
+            self._keys[-1] = str(value)  # Unquoted key
+        else:
+            self._add(value, completed)
+
+    def _open(self, container: Any) -> None:
+        if self._stack:
+            self._attach(container)
+        else:
+            self._root = container
+        self._stack.append(container)
+        self._keys.append(None)
+
+    def _close(self, completed: List[Any]) -> None:
+        container = self._stack.pop()
+        self._keys.pop()
+        if not self._stack:
+            self._closed = True
+        elif len(self._stack) == 1 and isinstance(self._root, list):
+            completed.append(container)
+
+    def _add(self, value: Any, completed: List[Any]) -> None:
+        if self._attach(value) and len(self._stack) == 1 and isinstance(self._root, list):
+            completed.append(value)
+
+    def _attach(self, value: Any) -> bool:
+        parent = self._stack[-1]
+        if isinstance(parent, list):
+            parent.append(value)
+            return True
+        key = self._keys[-1]
+        if key is None:
+            return False  # A value without a key (e.g. an object inside an object's key position)
+        parent[key] = value
+        self._keys[-1] = None
+        return True
+
+
+def _salvage(raw: str) -> Any:
+    """Best-effort value of the first JSON array or object in `raw`; for an array, its completed items."""
+    start = next((i for i, char in enumerate(raw) if char in "[{"), -1)
+    if start < 0:
+        return None
+    if raw[start] == "{":
+        parser = PartialJsonParser()
+        parser.feed(raw[start:])
+        return parser.value
+    # Decode well-formed items at C speed and only run the character-level parser from the first
+    # item that does not decode (single quotes, a truncated tail...).
+    items, pos = [], start + 1
+    while True:
+        pos = _SEPARATORS.match(raw, pos).end()
+        if pos >= len(raw) or raw[pos] == "]":
+            return items
+        try:
+            item, pos = _decoder.raw_decode(raw, pos)
+        except ValueError:
+            break
+        items.append(item)
+    return items + PartialJsonParser().feed("[" + raw[pos:])
+
+
+def parse_llm_json(raw: str) -> Tuple[Any, bool]:
+    """
+    Parses LLM output. Returns (value, complete): complete is False when the strict parse failed and
+    `value` was salvaged from the output (for an array, only its completed items).
+    Raises JSONDecodeError if nothing could be salvaged.
+    """
+    try:
+        return loads(raw), True
+    except JSONDecodeError:
+        value = _salvage(raw)
+        if value is None:
+            raise
+        return value, False
+
+
+# --- Compiled response schemas ---
+
+Normalizer = Callable[[Any], Any]
+_MISSING = object()
+# Floats are not exact NUMBERs: they go through _coerce_number so NaN and infinities are rejected.
+_EXACT_TYPES = {"STRING": (str,), "NUMBER": (int,), "INTEGER": (int,), "BOOLEAN": (bool,)}
+
+
+def _coerce_string(value: Any) -> Any:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return dumps(value)
+    return _MISSING if value is None else str(value)
+
+
+def _coerce_number(value: Any) -> Any:
+    if isinstance(value, bool):
+        return _MISSING
+    if isinstance(value, int):
+        return value
+    if not isinstance(value, float):
+        try:
+            value = float(str(value).strip())
+        except ValueError:
+            return _MISSING
+    # "NaN" / "Infinity" parse as floats but are not valid field values (and int() raises on them).
+    return value if math.isfinite(value) else _MISSING
+
+
+def _coerce_integer(value: Any) -> Any:
+    number = _coerce_number(value)
+    return number if number is _MISSING else int(number)
+
+
+def _coerce_boolean(value: Any) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "yes", "1"):
+            return True
+        if lowered in ("false", "no", "0"):
+            return False
+        return _MISSING
+    if isinstance(value, (int, float)):
+        return bool(value)
+    return _MISSING
+
+
+def _enum_coercer(choices: Sequence[str]) -> Normalizer:
+    by_folded = {choice.casefold(): choice for choice in choices}
+    exact = frozenset(choices)
+
+    def coerce(value: Any) -> Any:
+        if value in exact:
+            return value
+        if isinstance(value, str):
+            return by_folded.get(value.strip().casefold(), _MISSING)
+        return _MISSING
+    return coerce
+
+
+def _json_string_decoder(field: str) -> Normalizer:
+    def decode(value: Any) -> Any:
+        if not isinstance(value, str):
+            return value if isinstance(value, (dict, list)) else {}
+        try:
+            return loads(value)
+        except JSONDecodeError:
+            logger.warning("Failed to parse JSON string for field '%s': %s. Setting to empty dict.", field, value)
+            return {}
+    return decode
+
+
+def _exact_types(schema: Mapping[str, Any]) -> Tuple[type, ...]:
+    """Value types that already match `schema` as-is, so the coercer can be skipped for them."""
+    if "enum" in schema:
+        return ()
+    return _EXACT_TYPES.get(str(schema.get("type", "STRING")).upper(), ())
+
+
+def _compile(schema: Mapping[str, Any]) -> Normalizer:
+    kind = str(schema.get("type", "STRING")).upper()
+    if "enum" in schema:
+        return _enum_coercer(schema["enum"])
+    if kind == "NUMBER":
+        return _coerce_number
+    if kind == "INTEGER":
+        return _coerce_integer
+    if kind == "BOOLEAN":
+        return _coerce_boolean
+    if kind == "ARRAY":
+        item = _compile(schema.get("items", {}))
+        item_types = _exact_types(schema.get("items", {}))
+
+        def coerce_array(value: Any) -> Any:
+            if type(value) is list and item_types and all(type(entry) in item_types for entry in value):
+                return value
+            if isinstance(value, str):
+                try:
+                    value = loads(value)
+                except JSONDecodeError:
+                    value = [part.strip() for part in value.split(",") if part.strip()]
+            if not isinstance(value, list):
+                return _MISSING
+            coerced = [item(entry) for entry in value]
+            return [entry for entry in coerced if entry is not _MISSING]
+        return coerce_array
+    if kind == "OBJECT":
+        return CompiledSchema(schema).normalize
+    return _coerce_string
+
+
+class CompiledSchema:
+    """
+    A Gemini response schema (OBJECT, or ARRAY of OBJECT) compiled once into per-field coercers.
+
+    normalize() projects an object onto the schema's properties plus `passthrough_keys`, coerces every
+    value to its declared type (numbers from strings, booleans from "true"/"false", enum values matched
+    case-insensitively, arrays from JSON or comma-separated strings), decodes `json_string_fields` into
+    objects and fills `defaults` (values, or callables taking the object) for missing or invalid fields.
+    Values that cannot be coerced are dropped, so the database default applies instead.
+    """
+
+    def __init__(self, schema: Mapping[str, Any], json_string_fields: Iterable[str] = (),
+                 passthrough_keys: Iterable[str] = (), defaults: Optional[Mapping[str, Any]] = None):
+        if str(schema.get("type", "")).upper() == "ARRAY":
+            schema = schema.get("items", {})
+        properties = schema.get("properties", {})
+        json_string_fields = set(json_string_fields)
+        self.fields: Tuple[Tuple[str, Tuple[type, ...], Normalizer], ...] = tuple(
+            (field, (), _json_string_decoder(field)) if field in json_string_fields
+            else (field, _exact_types(spec), _compile(spec))
+            for field, spec in properties.items())
+        self.passthrough_keys = tuple(passthrough_keys)
+        self.defaults = dict(defaults or {})
+
+    def normalize(self, obj: Any) -> Any:
+        if not isinstance(obj, dict):
+            return _MISSING
+        normalized = {}
+        get = obj.get
+        for field, exact_types, coerce in self.fields:
+            value = get(field)
+            if value is None:
+                continue
+            if type(value) not in exact_types:
+                value = coerce(value)
+                if value is _MISSING:
+                    continue
+            normalized[field] = value
+        for key in self.passthrough_keys:
+            if key in obj:
+                normalized[key] = obj[key]
+        for field, default in self.defaults.items():
+            if normalized.get(field) in (None, ""):
+                normalized[field] = default(normalized) if callable(default) else default
+        return normalized
+
+    def normalize_many(self, objs: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Normalizes a list of objects, skipping entries that are not objects."""
+        normalize = self.normalize
+        return [row for row in map(normalize, objs) if row is not _MISSING]
+
+
+def compile_schema(schema: Mapping[str, Any], json_string_fields: Iterable[str] = (),
+                   passthrough_keys: Iterable[str] = (), defaults: Optional[Mapping[str, Any]] = None) -> CompiledSchema:
+    return CompiledSchema(schema, json_string_fields, passthrough_keys, defaults)
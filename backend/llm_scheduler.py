@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+    INTERACTIVE = 0  # profile bios, news feed, daily prompt: a user is waiting
+    BULK = 1  # dummy-user generation and other background work
+
+
+def estimate_tokens(prompt_text: str, max_new_tokens: int) -> float:
+    """Rough prompt + output token count used for tokens-per-minute accounting (~4 characters per token)."""
+    return len(prompt_text) / 4.0 + max_new_tokens
+
+
+class LLMQuotaExceededError(Exception):
+    """Raised by the Gemini call when the API answers RESOURCE_EXHAUSTED."""
+
+
+class LLMThrottledError(Exception):
+    """Raised to callers when the scheduler sheds a request instead of sending it to Gemini."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute` tokens per minute, holding at most `capacity`."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        # May go negative when a call used more tokens than estimated; later callers then wait it out.
+        self.tokens -= amount
+
+
+class LocalQuota:
+    """Requests-per-minute and tokens-per-minute buckets for this process only (see shared_state.SharedQuota)."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+
+    def try_acquire(self, tokens: float, now: float) -> float:
+        """Takes one request and `tokens` tokens and returns 0 if both are available, else the seconds to wait."""
+        wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+        if wait <= 0:
+            self._requests.consume(1, now)
+            self._tokens.consume(tokens, now)
+        return wait
+
+    def charge(self, tokens: float, now: float) -> None:
+        self._tokens.consume(tokens, now)
+
+    def available(self) -> Dict[str, Any]:
+        return {"requests_available": round(self._requests.tokens, 1), "tokens_available": round(self._tokens.tokens, 1)}
+
+
+class LLMScheduler:
+    """
+    Quota-aware admission control in front of Gemini.
+
+    Callers await acquire(priority, estimated_tokens) before each call. Requests are granted strictly in
+    priority order as the requests-per-minute and tokens-per-minute buckets allow. On RESOURCE_EXHAUSTED
+    (record_quota_error) all dispatch pauses for an exponential backoff with jitter; after
+    `breaker_threshold` consecutive quota errors the circuit opens and every request is shed with
+    LLMThrottledError for `breaker_open_seconds`, after which one interactive probe is let through
+    (half-open) to test whether Gemini has recovered.
+
+    The buckets are per process unless a shared `quota` (shared_state.SharedQuota) is passed, which
+    enforces the limits across all workers on the host. Backoff and breaker state stay per process.
+    """
+
+    def __init__(self, requests_per_minute: float = 1000, tokens_per_minute: float = 1000000,
+                 max_queue_depth: int = 1000, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 breaker_threshold: int = 5, breaker_open_seconds: float = 30.0, quota: Optional[Any] = None):
+        self._quota = quota if quota is not None else LocalQuota(requests_per_minute, tokens_per_minute)
+        self.max_queue_depth = max_queue_depth
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_open_seconds = breaker_open_seconds
+
+        self._heap: List[Tuple[int, int, float, asyncio.Future, float]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._paused_until = 0.0
+        self._consecutive_quota_errors = 0
+        self.state = "closed"  # closed -> open -> half_open -> closed | open
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._probe_future: Optional[asyncio.Future] = None
+
+        self.queue_depth = {p.name.lower(): 0 for p in Priority}
+        self.shed = {p.name.lower(): 0 for p in Priority}
+        self.granted = {p.name.lower(): 0 for p in Priority}
+        self.quota_errors = 0
+        self._wait_total = {p.name.lower(): 0.0 for p in Priority}
+        self._wait_max = {p.name.lower(): 0.0 for p in Priority}
+
+    # --- Admission ---
+
+    async def acquire(self, priority: Priority, estimated_tokens: float) -> None:
+        is_probe = self._check_breaker(priority)
+        name = Priority(priority).name.lower()
+        if priority != Priority.INTERACTIVE and self.queue_depth[name] >= self.max_queue_depth:
+            self.shed[name] += 1
+            raise LLMThrottledError("LLM queue is full", retry_after=self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        if is_probe:
+            self._probe_future = future
+        heapq.heappush(self._heap, (int(priority), next(self._sequence), estimated_tokens, future, time.monotonic()))
+        self.queue_depth[name] += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Timed out or caller went away; _dispatch drops cancelled entries from the heap.
+            future.cancel()
+            # Only the probe itself frees the probe slot, not other interactive requests queued before it.
+            if future is self._probe_future:
+                self._release_probe()
+            raise
+
+    def _check_breaker(self, priority: Priority) -> bool:
+        """Raises LLMThrottledError if the breaker sheds the request; returns True if it is the half-open probe."""
+        now = time.monotonic()
+        if self.state == "open" and now >= self._open_until:
+            self.state = "half_open"
+            self._release_probe()
+        if self.state == "closed":
+            return False
+        if self.state == "half_open" and priority == Priority.INTERACTIVE and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.shed[Priority(priority).name.lower()] += 1
+        raise LLMThrottledError("Gemini is throttled; circuit breaker is open", retry_after=self._retry_after())
+
+    def _retry_after(self) -> float:
+        now = time.monotonic()
+        return round(max(1.0, self._open_until - now, self._paused_until - now), 1)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        wait = 0.0
+        while self._heap:
+            priority, _, tokens, future, enqueued = self._heap[0]
+            name = Priority(priority).name.lower()
+            if future.done():
+                heapq.heappop(self._heap)
+                self.queue_depth[name] -= 1
+                continue
+            if self.state == "open":
+                heapq.heappop(self._heap)
+                self.queue_depth[name] -= 1
+                self.shed[name] += 1
+                future.set_exception(LLMThrottledError("Gemini is throttled; circuit breaker is open", retry_after=self._retry_after()))
+                continue
+            wait = self._paused_until - now
+            if wait <= 0:
+                wait = self._quota.try_acquire(tokens, now)
+            if wait > 0:
+                break
+            heapq.heappop(self._heap)
+            self.queue_depth[name] -= 1
+            waited = now - enqueued
+            self.granted[name] += 1
+            self._wait_total[name] += waited
+            self._wait_max[name] = max(self._wait_max[name], waited)
+            future.set_result(None)
+        if self._heap and wait > 0:
+            self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+
+    # --- Feedback from completed calls ---
+
+    def record_success(self, extra_tokens: float = 0.0) -> None:
+        """Call after a successful Gemini call; `extra_tokens` charges usage beyond the estimate."""
+        if extra_tokens > 0:
+            self._quota.charge(extra_tokens, time.monotonic())
+        self._consecutive_quota_errors = 0
+        if self.state == "half_open":
+            logger.info("Gemini probe succeeded; closing circuit breaker.")
+            self.state = "closed"
+            self._release_probe()
+
+    def record_failure(self) -> None:
+        """
+        Call after a call that failed for another reason (timeout, disconnect, API error). It says nothing
+        about quota, so the breaker stays as it is; a failed half-open probe just frees the probe slot.
+        """
+        if self.state == "half_open":
+            self._release_probe()
+
+    def _release_probe(self) -> None:
+        self._probe_in_flight = False
+        self._probe_future = None
+
+    def record_quota_error(self) -> float:
+        """Call after RESOURCE_EXHAUSTED. Pauses dispatch with backoff and may open the breaker; returns the pause."""
+        now = time.monotonic()
+        self.quota_errors += 1
+        self._consecutive_quota_errors += 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (self._consecutive_quota_errors - 1))
+        delay *= 0.5 + random.random()  # Jitter so workers and clients do not retry in lockstep.
+        self._paused_until = max(self._paused_until, now + delay)
+
+        if self.state == "half_open" or self._consecutive_quota_errors >= self.breaker_threshold:
+            if self.state != "open":
+                logger.warning("Opening Gemini circuit breaker for %.0fs after %d quota errors.",
+                               self.breaker_open_seconds, self._consecutive_quota_errors)
+            self.state = "open"
+            self._open_until = now + self.breaker_open_seconds
+            self._release_probe()
+        if self._heap:
+            self._dispatch()
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "queue_depth": dict(self.queue_depth),
+            "granted": dict(self.granted),
+            "shed": dict(self.shed),
+            "quota_errors": self.quota_errors,
+            "avg_wait_seconds": {name: (self._wait_total[name] / self.granted[name] if self.granted[name] else 0.0)
+                                 for name in self.granted},
+            "max_wait_seconds": dict(self._wait_max),
+            "paused_for_seconds": max(0.0, self._paused_until - time.monotonic()),
+            **self._quota.available(),
+        }
@@ -0,0 +1,336 @@
+import atexit
+import bisect
+import contextvars
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 180.0)
+
+TRACE_HEADER = "x-request-id"
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: O(log buckets) to observe, no per-sample storage."""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimates the q-quantile by linear interpolation inside the bucket that contains it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 6),
+            "p50_seconds": round(self.quantile(0.5), 6),
+            "p95_seconds": round(self.quantile(0.95), 6),
+            "p99_seconds": round(self.quantile(0.99), 6),
+            "max_seconds": round(self.max, 6),
+        }
+
+
+def _flatten_numeric(prefix: str, values: Dict[str, Any]) -> Iterator[Tuple[str, LabelKey, float]]:
+    """Yields (name, labels, value) gauges from a stats() dict; one level of nesting becomes a `key` label."""
+    for name, value in values.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            yield f"{prefix}_{name}", (), float(value)
+        elif isinstance(value, dict):
+            for key, sub_value in value.items():
+                if isinstance(sub_value, (int, float)) and not isinstance(sub_value, bool):
+                    yield f"{prefix}_{name}", (("key", str(key)),), float(sub_value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in labels) + "}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics: per-endpoint, per-phase latency histograms and labelled counters.
+
+    Updates take one uncontended lock and touch a dict entry, so they cost about a microsecond and are
+    safe from the LLM worker threads. Components with their own stats() (cache, scheduler) are
+    registered as collectors and read only when /metrics is scraped.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def observe(self, endpoint: str, phase: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((endpoint, phase))
+            if histogram is None:
+                histogram = self._histograms[(endpoint, phase)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        self._collectors[prefix] = collect
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _collect_gauges(self) -> List[Tuple[str, LabelKey, float]]:
+        gauges = []
+        for prefix, collect in self._collectors.items():
+            try:
+                gauges.extend(_flatten_numeric(prefix, collect()))
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", prefix, e)
+        return gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latency: Dict[str, Dict[str, Any]] = {}
+            for (endpoint, phase), histogram in sorted(self._histograms.items()):
+                latency.setdefault(endpoint, {})[phase] = histogram.to_dict()
+            counters: Dict[str, List[Dict[str, Any]]] = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        gauges: Dict[str, Any] = {}
+        for name, labels, value in self._collect_gauges():
+            if labels:
+                gauges.setdefault(name, {})[labels[0][1]] = value
+            else:
+                gauges[name] = value
+        return {"latency": latency, "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = ["# TYPE request_phase_seconds histogram"]
+        with self._lock:
+            for (endpoint, phase), histogram in sorted(self._histograms.items()):
+                base = (("endpoint", endpoint), ("phase", phase))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"request_phase_seconds_bucket{_format_labels(base + (('le', le),))} {cumulative}")
+                lines.append(f"request_phase_seconds_sum{_format_labels(base)} {histogram.sum}")
+                lines.append(f"request_phase_seconds_count{_format_labels(base)} {histogram.count}")
+            counters = sorted(self._counters.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, labels, value in self._collect_gauges():
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# --- Request tracing ---
+
+class RequestTrace:
+    """
+    Per-request trace id plus the phase timings and counters recorded while serving it.
+
+    The endpoint label (the route template) is only known once routing has happened, so recordings are
+    buffered here and flushed into the registry by finish(). Work that outlives the request (background
+    jobs started by it) records straight into the registry under the same endpoint.
+    """
+
+    __slots__ = ("trace_id", "endpoint", "phases", "counters", "finished")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.endpoint = "unmatched"
+        self.phases: Dict[str, float] = {}
+        self.counters: List[Tuple[str, float, Dict[str, str]]] = []
+        self.finished = False
+
+    def finish(self, endpoint: str, status: int, total_seconds: float, registry: MetricsRegistry) -> None:
+        self.endpoint = endpoint
+        self.finished = True
+        registry.observe(endpoint, "total", total_seconds)
+        for phase, seconds in self.phases.items():
+            registry.observe(endpoint, phase, seconds)
+        for name, amount, labels in self.counters:
+            registry.inc(name, amount, endpoint=endpoint, **labels)
+        registry.inc("http_requests_total", endpoint=endpoint, status=str(status))
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+def get_trace_id() -> str:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else "-"
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Adds `seconds` to the current request's `phase` (a request can spend several spans in one phase)."""
+    trace = _current_trace.get()
+    if trace is None:
+        metrics.observe("background", phase, seconds)
+    elif trace.finished:
+        metrics.observe(trace.endpoint, phase, seconds)
+    else:
+        trace.phases[phase] = trace.phases.get(phase, 0.0) + seconds
+
+
+def count(name: str, amount: float = 1.0, **labels: str) -> None:
+    """Increments counter `name`, labelled with the current request's endpoint once it is known."""
+    trace = _current_trace.get()
+    if trace is None:
+        metrics.inc(name, amount, endpoint="background", **labels)
+    elif trace.finished:
+        metrics.inc(name, amount, endpoint=trace.endpoint, **labels)
+    else:
+        trace.counters.append((name, amount, labels))
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+class TraceMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering, unlike BaseHTTPMiddleware) that assigns
+    each request a trace id, echoes it in the X-Request-ID response header and records total latency,
+    status and phase timings under the matched route template.
+    """
+
+    def __init__(self, app: Callable, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        for name, value in scope.get("headers", ()):
+            if name == TRACE_HEADER.encode("latin-1"):
+                candidate = value.decode("latin-1")
+                trace_id = candidate if _VALID_TRACE_ID.match(candidate) else None
+                break
+        trace = RequestTrace(trace_id or uuid.uuid4().hex)
+        token = _current_trace.set(trace)
+        header = (TRACE_HEADER.encode("latin-1"), trace.trace_id.encode("latin-1"))
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_trace_id(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [header]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except Exception as e:
+            trace.counters.append(("errors_total", 1.0, {"error": type(e).__name__}))
+            raise
+        finally:
+            route = scope.get("route")
+            endpoint = f"{scope['method']} {route.path}" if route is not None else "unmatched"
+            trace.finish(endpoint, status, time.perf_counter() - started, self.registry)
+            _current_trace.reset(token)
+
+
+# --- Logging ---
+
+class TraceIdFilter(logging.Filter):
+    """
+    Stamps each record with the current request's trace id. Runs on the caller's thread before the record
+    is queued, which is why the request's trace contextvar is still visible.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = get_trace_id()
+        return True
+
+
+def configure_logging(level: str = "INFO",
+                      fmt: str = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s"
+                      ) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a QueueHandler so request handlers do not block on stream I/O. The
+    caller's thread still merges the message with its arguments and renders any traceback
+    (QueueHandler.prepare), which keeps records safe from later changes to their arguments; the
+    QueueListener thread applies `fmt` and does the (blocking) write.
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(fmt))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(TraceIdFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level.upper())
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
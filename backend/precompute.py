@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# generate_news_feed(summary, activity, num_items, existing_items): existing_items is None for a full
+# regeneration, or the current feed when only items for `activity` (the new events) are wanted.
+NewsFeedGenerator = Callable[[str, List[Dict[str, Any]], int, Optional[List[str]]], Awaitable[Optional[List[str]]]]
+DailyPromptGenerator = Callable[[Optional[str]], Awaitable[Optional[str]]]
+
+
+def _activity_key(event: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(event, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class PrecomputedPrompt:
+    __slots__ = ("text", "period", "generated_at", "last_requested")
+
+    def __init__(self, last_requested: float):
+        self.text: Optional[str] = None
+        self.period = -1
+        self.generated_at = 0.0
+        self.last_requested = last_requested
+
+
+class NewsFeedState:
+    """What is known about one user's feed: recent activity, activity not yet reflected in it, and the feed."""
+
+    __slots__ = ("summary", "num_items", "activity", "pending", "items", "generated_at", "last_active", "refreshing")
+
+    def __init__(self, summary: str, num_items: int, now: float):
+        self.summary = summary
+        self.num_items = num_items
+        self.activity: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.pending: List[Dict[str, Any]] = []
+        self.items: Optional[List[str]] = None
+        self.generated_at = 0.0
+        self.last_active = now
+        self.refreshing = False
+
+
+class FeedPrecomputer:
+    """
+    Opt-in ahead-of-time generation of daily prompts and news feeds.
+
+    Request handlers only do dictionary lookups: get_daily_prompt() and observe_news_feed() return a
+    precomputed result if one is fresh enough, otherwise None and the caller generates live (and hands
+    the result back with put_daily_prompt()/put_news_feed()). A background loop, woken every `interval`
+    seconds or shortly after new activity arrives, then:
+
+    - generates the daily prompt once per `period` for every context requested within `active_window`;
+      the previous period's prompt keeps being served for up to `prompt_grace` seconds after rollover;
+    - refreshes the feed of every user active within `active_window` once it is `feed_refresh` seconds
+      old, or as soon as new activity arrives. New activity is folded in incrementally (only the new
+      events go to the LLM and the resulting items are prepended) while the feed is younger than
+      `feed_max_staleness`; older feeds are regenerated from the user's last `activity_window` events.
+
+    Feeds older than `feed_max_staleness` are never served.
+    """
+
+    def __init__(self, generate_daily_prompt: DailyPromptGenerator, generate_news_feed: NewsFeedGenerator,
+                 interval: float = 30.0, period: float = 86400.0, prompt_grace: float = 3600.0,
+                 feed_refresh: float = 300.0, feed_max_staleness: float = 900.0, active_window: float = 86400.0,
+                 max_users: int = 10000, max_contexts: int = 100, max_parallel: int = 4,
+                 activity_window: int = 50, debounce: float = 2.0):
+        self.generate_daily_prompt = generate_daily_prompt
+        self.generate_news_feed = generate_news_feed
+        self.interval = interval
+        self.period = period
+        self.prompt_grace = prompt_grace
+        self.feed_refresh = feed_refresh
+        self.feed_max_staleness = feed_max_staleness
+        self.active_window = active_window
+        self.max_users = max_users
+        self.max_contexts = max_contexts
+        self.max_parallel = max_parallel
+        self.activity_window = activity_window
+        self.debounce = debounce
+
+        self._prompts: "OrderedDict[str, PrecomputedPrompt]" = OrderedDict()
+        self._feeds: "OrderedDict[str, NewsFeedState]" = OrderedDict()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"prompt_hits": 0, "prompt_misses": 0, "feed_hits": 0, "feed_misses": 0,
+                         "prompts_generated": 0, "feeds_generated": 0, "feeds_updated_incrementally": 0,
+                         "refresh_failures": 0}
+
+    def current_period(self, now: Optional[float] = None) -> int:
+        return int((time.time() if now is None else now) // self.period)
+
+    # --- Hot path (no LLM calls) ---
+
+    def get_daily_prompt(self, context: Optional[str], now: Optional[float] = None) -> Optional[str]:
+        now = time.time() if now is None else now
+        entry = self._track_context(context or "", now)
+        period = self.current_period(now)
+        # The grace window runs from the rollover, whenever in the last period the prompt was generated.
+        in_grace = entry.period == period - 1 and now - period * self.period <= self.prompt_grace
+        fresh = entry.period == period or in_grace
+        if entry.text is not None and fresh:
+            self.counters["prompt_hits"] += 1
+            return entry.text
+        self.counters["prompt_misses"] += 1
+        return None
+
+    def put_daily_prompt(self, context: Optional[str], text: str, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        entry = self._track_context(context or "", now)
+        entry.text, entry.period, entry.generated_at = text, self.current_period(now), now
+
+    def _track_context(self, key: str, now: float) -> PrecomputedPrompt:
+        entry = self._prompts.get(key)
+        if entry is None:
+            entry = self._prompts[key] = PrecomputedPrompt(now)
+            while len(self._prompts) > self.max_contexts:
+                self._prompts.popitem(last=False)
+        entry.last_requested = now
+        self._prompts.move_to_end(key)
+        return entry
+
+    def observe_news_feed(self, user_id: str, summary: str, activity: List[Dict[str, Any]], num_items: int,
+                          now: Optional[float] = None) -> Optional[List[str]]:
+        """Records the request's activity for the next refresh and returns a fresh precomputed feed, if any."""
+        now = time.time() if now is None else now
+        state = self._feed_state(user_id, summary, num_items, now)
+        self._add_activity(state, activity)
+        if state.items is not None and len(state.items) >= num_items and now - state.generated_at <= self.feed_max_staleness:
+            self.counters["feed_hits"] += 1
+            return state.items[:num_items]
+        self.counters["feed_misses"] += 1
+        return None
+
+    def put_news_feed(self, user_id: str, items: List[str], now: Optional[float] = None) -> None:
+        state = self._feeds.get(user_id)
+        if state is not None:
+            state.items, state.generated_at, state.pending = items, time.time() if now is None else now, []
+
+    def add_activity(self, user_id: str, activity: List[Dict[str, Any]], summary: Optional[str] = None,
+                     num_items: int = 3, now: Optional[float] = None) -> int:
+        """Records new activity for `user_id`; the feed is updated in the background. Returns the number of new events."""
+        now = time.time() if now is None else now
+        state = self._feed_state(user_id, summary, num_items, now)
+        return self._add_activity(state, activity)
+
+    def _feed_state(self, user_id: str, summary: Optional[str], num_items: int, now: float) -> NewsFeedState:
+        state = self._feeds.get(user_id)
+        if state is None:
+            state = self._feeds[user_id] = NewsFeedState(summary or "", num_items, now)
+            while len(self._feeds) > self.max_users:
+                self._feeds.popitem(last=False)
+        if summary:
+            state.summary = summary
+        state.num_items = max(state.num_items, num_items)
+        state.last_active = now
+        self._feeds.move_to_end(user_id)
+        return state
+
+    def _add_activity(self, state: NewsFeedState, activity: List[Dict[str, Any]]) -> int:
+        new_events = 0
+        for event in activity:
+            key = _activity_key(event)
+            if key in state.activity:
+                continue
+            state.activity[key] = event
+            state.pending.append(event)
+            new_events += 1
+        while len(state.activity) > self.activity_window:
+            state.activity.popitem(last=False)
+        del state.pending[:-self.activity_window]
+        if new_events and self._wake is not None:
+            self._wake.set()
+        return new_events
+
+    # --- Background refresh ---
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+                # Let a burst of activity settle so it is folded into one update.
+                await asyncio.sleep(self.debounce)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Precompute pass failed: %s", e, exc_info=True)
+
+    async def run_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        """One refresh pass over tracked contexts and active users; returns how many of each were refreshed."""
+        now = time.time() if now is None else now
+        period = self.current_period(now)
+        contexts = [key for key, entry in self._prompts.items()
+                    if entry.period != period and now - entry.last_requested <= self.active_window]
+        users = [user_id for user_id, state in reversed(self._feeds.items())
+                 if not state.refreshing and now - state.last_active <= self.active_window
+                 and (state.items is None or state.pending or now - state.generated_at >= self.feed_refresh)]
+
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def bounded(refresh):
+            async with semaphore:
+                await refresh
+
+        await asyncio.gather(*(bounded(self._refresh_prompt(key, period)) for key in contexts),
+                             *(bounded(self._refresh_feed(user_id)) for user_id in users))
+        return {"prompts": len(contexts), "feeds": len(users)}
+
+    async def _refresh_prompt(self, key: str, period: int) -> None:
+        try:
+            text = await self.generate_daily_prompt(key or None)
+        except Exception as e:
+            text = None
+            logger.warning("Precomputing daily prompt for context %r failed: %s", key, e)
+        entry = self._prompts.get(key)
+        if not text or entry is None:
+            self.counters["refresh_failures"] += 1
+            return
+        entry.text, entry.period, entry.generated_at = text, period, time.time()
+        self.counters["prompts_generated"] += 1
+
+    async def _refresh_feed(self, user_id: str) -> None:
+        state = self._feeds.get(user_id)
+        if state is None:
+            return
+        state.refreshing = True
+        pending = list(state.pending)
+        incremental = (state.items is not None and pending
+                       and time.time() - state.generated_at < self.feed_max_staleness)
+        try:
+            if incremental:
+                new_items = await self.generate_news_feed(state.summary, pending, min(len(pending), state.num_items), state.items)
+                items = (new_items + state.items)[:state.num_items] if new_items else None
+            else:
+                items = await self.generate_news_feed(state.summary, list(state.activity.values()), state.num_items, None)
+        except Exception as e:
+            items = None
+            logger.warning("Precomputing news feed for user %s failed: %s", user_id, e)
+        finally:
+            state.refreshing = False
+
+        if not items:
+            self.counters["refresh_failures"] += 1
+            return
+        state.items, state.generated_at = items, time.time()
+        # Events that arrived while the LLM call was running stay pending for the next pass.
+        consumed = {id(event) for event in pending}
+        state.pending = [event for event in state.pending if id(event) not in consumed]
+        self.counters["feeds_updated_incrementally" if incremental else "feeds_generated"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "contexts": len(self._prompts),
+            "users": len(self._feeds),
+            "users_with_pending_activity": sum(1 for state in self._feeds.values() if state.pending),
+            **self.counters,
+        }
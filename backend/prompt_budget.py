@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import math
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Relevance of an activity by (substring of) its type; the first match wins, unknown types weigh 1.0.
+ACTIVITY_TYPE_WEIGHTS = [
+    ("match", 3.0),
+    ("message", 3.0),
+    ("like", 2.0),
+    ("event", 1.5),
+    ("view", 1.0),
+]
+TIMESTAMP_FIELDS = ("timestamp", "created_at", "time", "at", "date")
+MAX_FIELD_CHARS = 120
+
+
+def approx_token_count(text: str) -> int:
+    """Same ~4 characters per token estimate the quota scheduler uses; no API round-trip."""
+    return math.ceil(len(text) / 4)
+
+
+def _event_key(event: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(event, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _event_type(event: Dict[str, Any]) -> str:
+    return str(event.get("type") or event.get("event_type") or "activity").strip().lower()
+
+
+def _event_time(event: Dict[str, Any]) -> Optional[float]:
+    for field in TIMESTAMP_FIELDS:
+        value = event.get(field)
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+def _event_subject(event: Dict[str, Any]) -> Optional[str]:
+    for field, value in event.items():
+        if isinstance(value, str) and ("name" in field or field in ("from", "with", "target", "by")):
+            return value[:40]
+    return None
+
+
+def _compact_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Drops empty fields and truncates long strings so one chatty event cannot use the whole budget."""
+    compact = {}
+    for field, value in event.items():
+        if value is None or value == "" or value == [] or value == {}:
+            continue
+        if isinstance(value, str) and len(value) > MAX_FIELD_CHARS:
+            value = value[:MAX_FIELD_CHARS] + "..."
+        compact[field] = value
+    return compact
+
+
+def _weight(event_type: str) -> float:
+    for fragment, weight in ACTIVITY_TYPE_WEIGHTS:
+        if fragment in event_type:
+            return weight
+    return 1.0
+
+
+class ActivityDigest:
+    """Rolling, per-user summary of activity that no longer fits in the prompt: counts and latest names per type."""
+
+    __slots__ = ("counts", "subjects", "folded", "_max_folded")
+
+    def __init__(self, max_folded: int = 2000):
+        self.counts: Dict[str, int] = {}
+        self.subjects: Dict[str, Deque[str]] = {}
+        self.folded: "OrderedDict[str, None]" = OrderedDict()
+        self._max_folded = max_folded
+
+    def fold(self, key: str, event: Dict[str, Any]) -> bool:
+        """Adds one event to the digest; returns False if it was already folded in."""
+        if key in self.folded:
+            return False
+        self.folded[key] = None
+        while len(self.folded) > self._max_folded:
+            self.folded.popitem(last=False)
+        event_type = _event_type(event)
+        self.counts[event_type] = self.counts.get(event_type, 0) + 1
+        subject = _event_subject(event)
+        if subject:
+            subjects = self.subjects.setdefault(event_type, deque(maxlen=3))
+            if subject not in subjects:
+                subjects.append(subject)
+        return True
+
+    def render(self) -> str:
+        if not self.counts:
+            return ""
+        parts = []
+        for event_type, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+            subjects = self.subjects.get(event_type)
+            latest = f" (latest: {', '.join(reversed(subjects))})" if subjects else ""
+            parts.append(f"{count} x {event_type}{latest}")
+        return "; ".join(parts)
+
+
+class CompactedActivity:
+    __slots__ = ("events", "digest", "tokens_before", "tokens_after", "dropped")
+
+    def __init__(self, events: List[Dict[str, Any]], digest: str, tokens_before: int, tokens_after: int, dropped: int):
+        self.events = events
+        self.digest = digest
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.dropped = dropped
+
+
+class ActivityPromptBudget:
+    """
+    Keeps the activity section of a prompt within `max_input_tokens` (prompt text included).
+
+    Activity is ranked by relevance (ACTIVITY_TYPE_WEIGHTS) times recency (halving every `half_life`
+    events, newest first; by timestamp when events carry one, otherwise by list position with the newest
+    last). The highest-ranked compacted events that fit are sent raw, in their original order. Everything
+    else is folded into a per-user ActivityDigest once and from then on only the digest line is sent, so
+    the prompt stays bounded however long the user's history grows. Without a user id the digest is built
+    for the single call.
+    """
+
+    def __init__(self, max_input_tokens: int = 1500, half_life: float = 10.0, max_users: int = 10000):
+        self.max_input_tokens = max_input_tokens
+        self.half_life = half_life
+        self.max_users = max_users
+        self._digests: "OrderedDict[str, ActivityDigest]" = OrderedDict()
+        self.calls = 0
+        self.compacted_calls = 0
+        self.tokens_before_total = 0
+        self.tokens_after_total = 0
+
+    def _digest_for(self, user_id: Optional[str]) -> ActivityDigest:
+        if not user_id:
+            return ActivityDigest()
+        digest = self._digests.get(user_id)
+        if digest is None:
+            digest = self._digests[user_id] = ActivityDigest()
+            while len(self._digests) > self.max_users:
+                self._digests.popitem(last=False)
+        self._digests.move_to_end(user_id)
+        return digest
+
+    def _ranked(self, activity: List[Dict[str, Any]]) -> List[Tuple[float, int]]:
+        times = [_event_time(event) for event in activity]
+        if all(t is not None for t in times):
+            order = sorted(range(len(activity)), key=lambda i: times[i], reverse=True)
+        else:
+            order = list(reversed(range(len(activity))))
+        ranked = [(_weight(_event_type(activity[i])) * 0.5 ** (age / self.half_life), i) for age, i in enumerate(order)]
+        ranked.sort(key=lambda item: -item[0])
+        return ranked
+
+    def compact(self, activity: List[Dict[str, Any]], fixed_text: str, user_id: Optional[str] = None) -> CompactedActivity:
+        """
+        `fixed_text` is the rest of the prompt (instructions, profile summary), counted against the budget.
+        Returns the events to send raw plus the digest line for the rest.
+        """
+        self.calls += 1
+        fixed_tokens = approx_token_count(fixed_text)
+        serialized = [json.dumps(event, default=str) for event in activity]
+        # Raw list as the prompt used to send it: items joined with ", " inside brackets.
+        tokens_before = fixed_tokens + approx_token_count("[" + ", ".join(serialized) + "]")
+        digest = self._digest_for(user_id)
+        self.tokens_before_total += tokens_before
+
+        if tokens_before <= self.max_input_tokens and not digest.counts:
+            self.tokens_after_total += tokens_before
+            return CompactedActivity(list(activity), "", tokens_before, tokens_before, 0)
+
+        keys = [_event_key(event) for event in activity]
+        # Reserve room for the digest line; it stays small (a handful of counts and names per type).
+        budget = self.max_input_tokens - fixed_tokens - 60
+        kept, used = set(), 2
+        for _, i in self._ranked(activity):
+            if keys[i] in digest.folded:
+                continue
+            cost = approx_token_count(json.dumps(_compact_event(activity[i]), default=str)) + 1
+            if used + cost > budget:
+                continue
+            kept.add(i)
+            used += cost
+
+        dropped = 0
+        for i, event in enumerate(activity):
+            if i not in kept and digest.fold(keys[i], event):
+                dropped += 1
+        events = [_compact_event(activity[i]) for i in sorted(kept)]
+        digest_text = digest.render()
+        tokens_after = fixed_tokens + approx_token_count(json.dumps(events, default=str)) + approx_token_count(digest_text)
+        self.compacted_calls += 1
+        self.tokens_after_total += tokens_after
+        logger.debug("Compacted activity prompt from ~%d to ~%d tokens (%d events kept, %d folded into digest).",
+                     tokens_before, tokens_after, len(events), dropped)
+        return CompactedActivity(events, digest_text, tokens_before, tokens_after, dropped)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_input_tokens": self.max_input_tokens,
+            "calls": self.calls,
+            "compacted_calls": self.compacted_calls,
+            "tokens_before_total": self.tokens_before_total,
+            "tokens_after_total": self.tokens_after_total,
+            "users_with_digest": len(self._digests),
+        }
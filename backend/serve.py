@@ -0,0 +1,66 @@
+"""
+Multi-worker entry point for the API.
+
+    python serve.py --workers 4 --port 8000
+
+Runs `main:app` in N uvicorn worker processes behind one listening socket. Before the workers are
+started, the shared state file (LLM response cache and Gemini quota buckets, see shared_state.py) is
+created and its path exported as SHARED_STATE_PATH, so every worker uses the same cache and the same
+host-wide quota. Gemini and Supabase clients are created lazily inside each worker, never before the
+fork. Run each worker's /ready check through the load balancer as usual.
+
+Only the LLM endpoints share state across workers. Discovery (/discover/*), profile embeddings
+(/embeddings/*), dummy-user jobs (/generate-dummy-users/jobs/*) and precompute mode keep per-process state.
+With more than one worker they are switched off (503; see SERVE_WORKERS in main.py). Route those paths to a
+separate single-worker instance, e.g. `uvicorn main:app --port 8001`.
+
+`uvicorn main:app` still works for a single process (with in-process cache and quota).
+"""
+import argparse
+import logging
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+from shared_state import SharedStateStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARED_STATE_PATH = os.path.join("data", "shared_state.sqlite3")
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="ASGI app import string")
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Worker processes (default: WEB_CONCURRENCY or CPU count)")
+    parser.add_argument("--shared-state", default=os.getenv("SHARED_STATE_PATH") or DEFAULT_SHARED_STATE_PATH,
+                        help="SQLite file shared by the workers; relative paths are resolved against --app-dir")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info").lower())
+    args = parser.parse_args()
+
+    shared_state_path = os.path.join(args.app_dir, args.shared_state)
+    SharedStateStore(shared_state_path).initialize()
+    # Inherited by the worker processes
+    os.environ["SHARED_STATE_PATH"] = shared_state_path
+    os.environ["SERVE_WORKERS"] = str(args.workers)
+    logging.basicConfig(level=args.log_level.upper())
+    logger.info("Starting %d worker(s) for %s on %s:%d (shared state: %s)", args.workers, args.app, args.host, args.port, shared_state_path)
+    if args.workers > 1:
+        logger.warning("Discovery, profile embeddings, dummy-user jobs and precompute mode are disabled with "
+                       "multiple workers; serve them from a single-worker instance.")
+
+    uvicorn.run(args.app, host=args.host, port=args.port, workers=args.workers, app_dir=args.app_dir,
+                log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
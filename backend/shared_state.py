@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    variants TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_updated_at ON llm_cache (updated_at);
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SharedStateStore:
+    """
+    Host-local state shared by every worker process: a SQLite file in WAL mode, so readers never block
+    and each write is one short transaction. Holds the LLM response cache and the Gemini quota buckets.
+
+    Each thread of each process gets its own connection (sqlite3 connections must not cross threads or
+    a fork). Times are wall-clock (time.time()) since monotonic clocks are not comparable across processes.
+
+    Callers may run on an event loop, so a write waits at most `busy_timeout` seconds for the lock held by
+    another worker and then raises sqlite3.OperationalError ("database is locked") for the caller to handle.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 0.05, evict_every: int = 64):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._puts = 0
+        self._initialized = False
+
+    def initialize(self) -> None:
+        """Creates the file and tables; safe to call from every worker and from the parent before forking."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        self._initialized = True
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            # isolation_level=None: transactions are explicit (BEGIN IMMEDIATE takes the write lock up front).
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _db(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.initialize()
+        return self._connect()
+
+    # --- LLM response cache ---
+
+    def cache_get(self, key: str) -> Optional[Tuple[List[str], float]]:
+        """(variants, expires_at) for `key`, expired or not, or None."""
+        row = self._db().execute("SELECT variants, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def cache_put(self, key: str, value: str, ttl: float, variants: int, max_entries: int) -> None:
+        """Adds `value` to the key's pool of at most `variants` responses; an expired pool is replaced."""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT variants, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                pool, expires_at = [], now + ttl
+            else:
+                pool, expires_at = json.loads(row[0]), row[1]
+            if value not in pool:
+                pool.append(value)
+                del pool[:-variants]
+            db.execute("INSERT OR REPLACE INTO llm_cache (key, variants, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                       (key, json.dumps(pool), expires_at, now))
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                db.execute("DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                           (max_entries,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def cache_clear(self) -> None:
+        self._db().execute("DELETE FROM llm_cache")
+
+    # --- Token buckets ---
+
+    def take_tokens(self, amounts: Dict[str, float], rates: Dict[str, float], capacities: Dict[str, float],
+                    force: bool = False) -> float:
+        """
+        Atomically takes `amounts[name]` from each named bucket (refilled at `rates[name]` tokens per second
+        up to `capacities[name]`) if all of them have enough, and returns 0; otherwise takes nothing and
+        returns the seconds until they will. With `force`, the tokens are taken regardless (buckets may go
+        negative) and 0 is returned.
+        """
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            for name in amounts:
+                row = db.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+                tokens = capacities[name] if row is None else row[0] + max(0.0, now - row[1]) * rates[name]
+                levels[name] = min(capacities[name], tokens)
+            wait = 0.0
+            if not force:
+                for name, amount in amounts.items():
+                    amount = min(amount, capacities[name])
+                    if levels[name] < amount:
+                        wait = max(wait, (amount - levels[name]) / rates[name])
+            if wait == 0.0:
+                db.executemany("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                               [(name, levels[name] - amount, now) for name, amount in amounts.items()])
+            db.execute("COMMIT")
+            return wait
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def token_levels(self, rates: Dict[str, float], capacities: Dict[str, float]) -> Dict[str, float]:
+        now = time.time()
+        levels = {}
+        for name in rates:
+            row = self._db().execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+            tokens = capacities[name] if row is None else row[0] + max(0.0, now - row[1]) * rates[name]
+            levels[name] = min(capacities[name], tokens)
+        return levels
+
+
+class SharedQuota:
+    """
+    Requests-per-minute and tokens-per-minute buckets kept in a SharedStateStore, so the Gemini quota
+    is enforced for the whole host rather than once per worker. Same interface as llm_scheduler.LocalQuota.
+
+    The scheduler calls this on the event loop, so the store must have a short busy timeout: when another
+    worker holds the lock, try_acquire() returns `busy_retry` seconds (the scheduler then retries like any
+    quota wait) and charge() keeps the tokens to charge them with the next admission.
+    """
+
+    def __init__(self, store: SharedStateStore, requests_per_minute: float, tokens_per_minute: float,
+                 prefix: str = "gemini", busy_retry: float = 0.01):
+        self.store = store
+        self.busy_retry = busy_retry
+        self.busy_retries = 0
+        self._uncharged_tokens = 0.0
+        self._requests, self._tokens = f"{prefix}:requests", f"{prefix}:tokens"
+        self._rates = {self._requests: requests_per_minute / 60.0, self._tokens: tokens_per_minute / 60.0}
+        self._capacities = {self._requests: requests_per_minute, self._tokens: tokens_per_minute}
+
+    def try_acquire(self, tokens: float, now: float) -> float:
+        try:
+            if self._uncharged_tokens:
+                self.store.take_tokens({self._tokens: self._uncharged_tokens}, self._rates, self._capacities, force=True)
+                self._uncharged_tokens = 0.0
+            return self.store.take_tokens({self._requests: 1, self._tokens: tokens}, self._rates, self._capacities)
+        except sqlite3.OperationalError as e:
+            self.busy_retries += 1
+            logger.debug("Shared quota store busy (%s); retrying in %ss.", e, self.busy_retry)
+            return self.busy_retry
+
+    def charge(self, tokens: float, now: float) -> None:
+        try:
+            self.store.take_tokens({self._tokens: tokens}, self._rates, self._capacities, force=True)
+        except sqlite3.OperationalError:
+            self._uncharged_tokens += tokens
+
+    def available(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"shared": True, "busy_retries": self.busy_retries}
+        try:
+            levels = self.store.token_levels(self._rates, self._capacities)
+        except sqlite3.OperationalError:
+            return stats
+        return {"requests_available": round(levels[self._requests], 1), "tokens_available": round(levels[self._tokens], 1),
+                **stats}
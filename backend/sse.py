@@ -0,0 +1,10 @@
+from typing import Any, Optional
+
+from llm_json import dumps
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """Formats one server-sent event. `data` is JSON-encoded so multi-line text stays on one data line."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {dumps(data)}\n\n"
+
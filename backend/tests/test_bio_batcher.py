@@ -0,0 +1,25 @@
+import asyncio
+
+from bio_batcher import ProfileBioBatcher
+from llm_scheduler import LLMThrottledError
+
+
+def test_throttled_fallback_is_raised_to_its_caller():
+    async def generate(prompt, max_new_tokens=None, response_schema=None):
+        if response_schema is not None:
+            return "not json"  # Batched call unusable: every item falls back to its own call.
+        if "throttled" in prompt:
+            raise LLMThrottledError("Gemini is throttled", retry_after=5)
+        if "broken" in prompt:
+            raise RuntimeError("boom")
+        return f"bio for {prompt}"
+
+    async def scenario():
+        batcher = ProfileBioBatcher(generate, window_ms=5, max_batch=3)
+        return await asyncio.gather(batcher.submit("ok"), batcher.submit("throttled"), batcher.submit("broken"),
+                                    return_exceptions=True)
+
+    ok, throttled, broken = asyncio.run(scenario())
+    assert ok == "bio for ok"
+    assert isinstance(throttled, LLMThrottledError) and throttled.retry_after == 5
+    assert broken is None
@@ -0,0 +1,32 @@
+from discovery import OTHER_COLUMN, ProfileFeatureMatrix
+
+
+def test_multi_hot_vocabulary_is_bounded():
+    matrix = ProfileFeatureMatrix(initial_capacity=4, max_vocabulary=8)
+    for i in range(100):
+        matrix.upsert({"id": f"user-{i}", "hobbies_and_interests": [f"hobby {i}", f"other hobby {i}"]})
+
+    stats = matrix.stats()
+    assert stats["vocabulary"]["hobbies_and_interests"] == 8
+    assert stats["vocabulary_overflow"]["hobbies_and_interests"] == 192
+    assert matrix._multi_hot["hobbies_and_interests"].shape[1] == 9
+
+
+def test_labels_are_normalized():
+    matrix = ProfileFeatureMatrix(initial_capacity=4, max_vocabulary=8)
+    matrix.upsert({"id": "a", "hobbies_and_interests": ["  Rock   Climbing!", "rock climbing", "HIKING"]})
+    matrix.upsert({"id": "b", "hobbies_and_interests": ["rock climbing"]})
+
+    assert matrix.stats()["vocabulary"]["hobbies_and_interests"] == 2
+    result = matrix.query(interests={"hobbies_and_interests": ["Rock climbing."]})
+    assert [profile["score"] for profile in result["profiles"]] == [1.0, 1.0]
+
+
+def test_overflow_labels_do_not_score():
+    matrix = ProfileFeatureMatrix(initial_capacity=4, max_vocabulary=1)
+    matrix.upsert({"id": "viewer", "hobbies_and_interests": ["chess", "rare hobby"]})
+    matrix.upsert({"id": "match", "hobbies_and_interests": ["another rare hobby"]})
+
+    assert OTHER_COLUMN not in matrix._preferences_of("viewer", "hobbies_and_interests")
+    result = matrix.query(viewer_id="viewer")
+    assert result["profiles"][0]["score"] == 0.0
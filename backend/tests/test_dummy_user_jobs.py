@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from dummy_user_jobs import DummyUserJobManager
+
+
+def make_manager(generate, inserted, **kwargs):
+    return DummyUserJobManager(generate, inserted.extend, chunk_size=2, max_parallel_chunks=4,
+                               insert_batch_size=100, max_chunk_attempts=1, retry_base_delay=0.001, **kwargs)
+
+
+def profiles(count):
+    return json.dumps([{"display_name": f"user {i}", "email": f"user{i}@example.com"} for i in range(count)])
+
+
+def test_crashed_chunk_does_not_stop_the_job():
+    calls = []
+
+    async def generate(prompt, **kwargs):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise RuntimeError("unexpected")
+        await asyncio.sleep(0.01)
+        return profiles(2)
+
+    async def scenario():
+        inserted = []
+        manager = make_manager(generate, inserted)
+        job = manager.start(6)
+        await manager._tasks[job.id]
+        return job, inserted
+
+    job, inserted = asyncio.run(scenario())
+    assert job.status == "completed_with_errors"
+    assert [chunk.status for chunk in job.chunks].count("failed") == 1
+    # The rows of the other chunks are below one insert batch and still go out in the final flush.
+    assert len(inserted) == job.inserted == 4
+
+
+def test_shutdown_flushes_generated_rows_and_marks_the_rest_failed():
+    async def generate(prompt, **kwargs):
+        if generate.calls:
+            await asyncio.sleep(10)
+        generate.calls += 1
+        return profiles(2)
+    generate.calls = 0
+
+    async def scenario():
+        inserted = []
+        manager = make_manager(generate, inserted)
+        job = manager.start(6)
+        await asyncio.sleep(0.05)
+        await manager.shutdown()
+        return manager, job, inserted
+
+    manager, job, inserted = asyncio.run(scenario())
+    assert not manager._tasks
+    assert job.status == "completed_with_errors"
+    assert [chunk.status for chunk in job.chunks] == ["done", "failed", "failed"]
+    assert len(inserted) == job.inserted == 2
@@ -0,0 +1,73 @@
+import os
+import time
+
+import numpy as np
+
+from embeddings import EmbeddingStore, HashingEmbeddingProvider
+
+
+def open_store(directory, **kwargs):
+    return EmbeddingStore(os.path.join(str(directory), "store"), HashingEmbeddingProvider(16), **kwargs)
+
+
+def random_vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, 16)).astype(np.float32)
+
+
+def test_updates_append_to_the_log_and_survive_reopening(tmp_path):
+    store = open_store(tmp_path)
+    snapshot_mtime = os.path.getmtime(store._index_path)
+    store.upsert_vectors(["a", "b", "c"], ["ha", "hb", "hc"], random_vectors(3))
+    store.remove_many(["b"])
+    store.upsert_vectors(["d"], ["hd"], random_vectors(1, seed=1))  # Reuses b's row
+
+    assert os.path.getmtime(store._index_path) == snapshot_mtime
+    assert store.stats()["index_log_entries"] == 5
+
+    reopened = open_store(tmp_path)
+    assert sorted(reopened._row_of) == ["a", "c", "d"]
+    assert reopened._hash_of("d") == "hd"
+    np.testing.assert_allclose(reopened.vector_of("d"), store.vector_of("d"))
+
+
+def test_log_is_compacted_into_an_atomic_snapshot(tmp_path):
+    store = open_store(tmp_path, compact_min_entries=4)
+    for i in range(5):
+        store.upsert_vectors([f"p{i}"], [None], random_vectors(1, seed=i))
+
+    assert store.stats()["index_log_entries"] == 0
+    assert not os.path.exists(store._index_path + ".tmp")
+    assert len(open_store(tmp_path)) == 5
+
+
+def test_torn_log_line_is_ignored(tmp_path):
+    store = open_store(tmp_path)
+    store.upsert_vectors(["a"], [None], random_vectors(1))
+    with open(store._log_path, "a", encoding="utf-8") as f:
+        f.write('{"row": 1, "id": "b"')
+
+    assert list(open_store(tmp_path)._row_of) == ["a"]
+
+
+def test_approximate_search_does_not_build_the_index_inline(tmp_path):
+    store = open_store(tmp_path, ann_threshold=10)
+    vectors = random_vectors(200)
+    store.upsert_vectors([f"p{i}" for i in range(200)], [None] * 200, vectors)
+    store.build_ann_index = lambda nlist=None: time.sleep(0.2)  # A slow build must not hold up the search
+
+    started = time.perf_counter()
+    matches = store.search(vectors[7], k=1, approximate=True)
+    assert time.perf_counter() - started < 0.1
+    assert matches[0][0] == "p7"  # Exact results until the index is ready
+    assert store.stats()["ann_index_building"]
+
+
+def test_index_is_built_in_the_background_when_opened(tmp_path):
+    store = open_store(tmp_path, ann_threshold=10)
+    store.upsert_vectors([f"p{i}" for i in range(200)], [None] * 200, random_vectors(200))
+
+    reopened = open_store(tmp_path, ann_threshold=10)
+    deadline = time.monotonic() + 5
+    while reopened._ann is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reopened.stats()["ann_index_rows"] == 200
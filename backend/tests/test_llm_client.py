@@ -0,0 +1,98 @@
+import asyncio
+import logging
+
+import pytest
+
+from llm_client import LLMClient
+from llm_scheduler import LLMQuotaExceededError, LLMScheduler, LLMThrottledError
+
+
+def half_open_scheduler() -> LLMScheduler:
+    scheduler = LLMScheduler(breaker_threshold=1, breaker_open_seconds=0.01, backoff_base=0.001, backoff_max=0.001)
+    scheduler.record_quota_error()
+    assert scheduler.state == "open"
+    return scheduler
+
+
+async def drain(client: LLMClient):
+    return [chunk async for chunk in client.stream("prompt")]
+
+
+def test_failed_stream_probe_does_not_close_breaker():
+    def broken_stream(prompt_text, **kwargs):
+        yield "partial"
+        raise RuntimeError("500 INTERNAL")
+
+    async def run():
+        scheduler = half_open_scheduler()
+        await asyncio.sleep(0.02)
+        chunks = await drain(LLMClient(lambda p, **k: None, stream_fn=broken_stream, scheduler=scheduler, timeout=1))
+        return scheduler, chunks
+
+    scheduler, chunks = asyncio.run(run())
+    assert chunks == ["partial"]
+    assert scheduler.state == "half_open"
+    assert scheduler.stats()["quota_errors"] == 1
+
+
+def test_empty_stream_probe_does_not_close_breaker():
+    async def run():
+        scheduler = half_open_scheduler()
+        await asyncio.sleep(0.02)
+        await drain(LLMClient(lambda p, **k: None, stream_fn=lambda p, **k: iter(()), scheduler=scheduler, timeout=1))
+        return scheduler
+
+    assert asyncio.run(run()).state == "half_open"
+
+
+def test_successful_stream_probe_closes_breaker():
+    async def run():
+        scheduler = half_open_scheduler()
+        await asyncio.sleep(0.02)
+        await drain(LLMClient(lambda p, **k: None, stream_fn=lambda p, **k: iter(["ok"]), scheduler=scheduler, timeout=1))
+        return scheduler
+
+    assert asyncio.run(run()).state == "closed"
+
+
+def test_stream_quota_error_raises_throttled():
+    def quota_stream(prompt_text, **kwargs):
+        raise LLMQuotaExceededError("429 RESOURCE_EXHAUSTED")
+        yield  # pragma: no cover
+
+    client = LLMClient(lambda p, **k: None, stream_fn=quota_stream, scheduler=LLMScheduler(backoff_base=0.001), timeout=1)
+    with pytest.raises(LLMThrottledError):
+        asyncio.run(drain(client))
+
+
+def test_gemini_stream_error_is_reraised(monkeypatch):
+    import main
+
+    class BrokenStreamModel:
+        def generate_content(self, prompt_text, generation_config=None, stream=False):
+            def chunks():
+                raise RuntimeError("500 INTERNAL: stream reset")
+                yield  # pragma: no cover
+            return chunks()
+
+    monkeypatch.setattr(main, "model", BrokenStreamModel())
+    with pytest.raises(RuntimeError):
+        list(main.stream_text_with_llm("prompt"))
+
+
+def test_quota_error_is_logged_once_as_warning(monkeypatch, caplog):
+    import main
+
+    class QuotaModel:
+        def generate_content(self, prompt_text, generation_config=None, stream=False):
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+
+    monkeypatch.setattr(main, "model", QuotaModel())
+    scheduler = LLMScheduler(backoff_base=0.001, backoff_max=0.001)
+    client = LLMClient(main.generate_text_with_llm, scheduler=scheduler, timeout=1, max_quota_retries=1)
+    with caplog.at_level(logging.DEBUG):
+        with pytest.raises(LLMThrottledError):
+            asyncio.run(client.generate("prompt"))
+
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+    assert len([record for record in caplog.records if "quota exceeded" in record.getMessage()]) == 1
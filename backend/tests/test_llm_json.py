@@ -0,0 +1,25 @@
+import pytest
+
+from llm_json import compile_schema
+
+SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "height_cm": {"type": "NUMBER"},
+        "age": {"type": "INTEGER"},
+        "scores": {"type": "ARRAY", "items": {"type": "NUMBER"}},
+    },
+}
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf"), "NaN", "Infinity", "-inf", "1e999"])
+def test_non_finite_numbers_are_invalid_fields(value):
+    normalized = compile_schema(SCHEMA).normalize({"height_cm": value, "age": value, "scores": [value, 1.5]})
+
+    assert normalized == {"scores": [1.5]}
+
+
+def test_finite_numbers_are_coerced():
+    normalized = compile_schema(SCHEMA).normalize({"height_cm": "172.5", "age": 31.0, "scores": [1, 2.5]})
+
+    assert normalized == {"height_cm": 172.5, "age": 31, "scores": [1, 2.5]}
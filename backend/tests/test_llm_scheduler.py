@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from llm_scheduler import LLMScheduler, LLMThrottledError, Priority
+
+
+def test_cancelled_waiter_that_is_not_the_probe_keeps_the_probe_slot():
+    async def scenario():
+        # One request per minute: the first acquire takes the only token, later ones queue.
+        scheduler = LLMScheduler(requests_per_minute=1, breaker_open_seconds=0.01)
+        await scheduler.acquire(Priority.INTERACTIVE, 1)
+        queued = asyncio.ensure_future(scheduler.acquire(Priority.INTERACTIVE, 1))
+        await asyncio.sleep(0)
+        # Half-open while `queued` still waits from before the breaker tripped.
+        scheduler.state = "half_open"
+        probe = asyncio.ensure_future(scheduler.acquire(Priority.INTERACTIVE, 1))
+        await asyncio.sleep(0)
+        assert scheduler._probe_in_flight
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert scheduler._probe_in_flight
+        with pytest.raises(LLMThrottledError):
+            await scheduler.acquire(Priority.INTERACTIVE, 1)
+
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        assert not scheduler._probe_in_flight
+
+    asyncio.run(scenario())
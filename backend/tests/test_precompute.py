@@ -0,0 +1,35 @@
+from precompute import FeedPrecomputer
+
+PERIOD = 86400.0
+GRACE = 3600.0
+
+
+async def _unused(*args):  # pragma: no cover - the loop is never started
+    return None
+
+
+def precomputer() -> FeedPrecomputer:
+    return FeedPrecomputer(_unused, _unused, period=PERIOD, prompt_grace=GRACE)
+
+
+def test_prompt_generated_early_in_period_is_served_after_rollover():
+    feeds = precomputer()
+    rollover = 10 * PERIOD
+    feeds.put_daily_prompt(None, "early prompt", now=rollover - PERIOD + 60)
+    assert feeds.get_daily_prompt(None, now=rollover + 1) == "early prompt"
+    assert feeds.get_daily_prompt(None, now=rollover + GRACE) == "early prompt"
+
+
+def test_prompt_generated_just_before_rollover_expires_with_grace_window():
+    feeds = precomputer()
+    rollover = 10 * PERIOD
+    feeds.put_daily_prompt(None, "late prompt", now=rollover - 60)
+    assert feeds.get_daily_prompt(None, now=rollover + GRACE) == "late prompt"
+    assert feeds.get_daily_prompt(None, now=rollover + GRACE + 1) is None
+
+
+def test_prompt_older_than_previous_period_is_not_served():
+    feeds = precomputer()
+    rollover = 10 * PERIOD
+    feeds.put_daily_prompt(None, "old prompt", now=rollover - PERIOD - 60)
+    assert feeds.get_daily_prompt(None, now=rollover + 1) is None